@@ -0,0 +1,110 @@
+"""
+    Address Codec:
+
+    Function:
+    - register addresses of the plc encoded as one int, area, word and bit
+      index packed together so sorting by address sorts by register
+    - parses and formats addresses as ISPSoft writes them, e.g. D10002 or X1.0
+    - compiles type strings, e.g. "ARRAY [3] OF WORD", into their element
+      type, count and size in encoded addresses
+    - shared by the generator and the tools working on its tables, none of
+      them has to import the generator for it
+"""
+
+import functools
+import re
+
+
+# 16 bits per word register, bit index is stored in the low 4 bits of an address
+BIT_INDEX_BITS = 4
+BIT_INDEX_MASK = (1 << BIT_INDEX_BITS) - 1
+
+# register area of an address is stored above the word index, D registers are area 0
+ADDR_AREAS = ("D", "X", "Y", "M", "SM", "SR", "S", "T", "C", "HC", "E", "PR", "$")
+AREA_SHIFT = 32
+WORD_MASK = (1 << (AREA_SHIFT - BIT_INDEX_BITS)) - 1
+HMI_AREA = ADDR_AREAS.index("$")
+ADDR_PATTERN = re.compile(r"([A-Z]+|\$)(\d+)(?:\.(\d+))?$")
+
+# bits each element type occupies, which is also its stride in encoded addresses
+TYPE_BITS = {
+    "BOOL": 1,
+    "WORD": 16, "INT": 16, "UINT": 16,
+    "DWORD": 32, "DINT": 32, "UDINT": 32, "REAL": 32,
+    "LWORD": 64, "LINT": 64, "LREAL": 64,
+}
+
+# element types that can be written into hmi_tag_table
+HMI_TYPES = {"BOOL": "BIT", "WORD": "WORD"}
+
+
+def encode_addr(word: int, bit: int = 0, area: int = 0) -> int:
+    # area, word and bit index of a register packed into one int, e.g. D123.4 -> 123 << 4 | 4
+    return (area << AREA_SHIFT) | (word << BIT_INDEX_BITS) | bit
+
+
+def format_addr(addr: int, is_bit: bool) -> str:
+    area = ADDR_AREAS[addr >> AREA_SHIFT]
+    word = (addr >> BIT_INDEX_BITS) & WORD_MASK
+    if is_bit:
+        return "{}{}.{}".format(area, word, addr & BIT_INDEX_MASK)
+    return "{}{}".format(area, word)
+
+
+def parse_addr(text: str) -> tuple:
+    # "D28002" -> (encoded addr, False), "X1.0" -> (encoded addr, True)
+    match = ADDR_PATTERN.match(str(text).strip())
+    if match is None or match.group(1) not in ADDR_AREAS:
+        raise RuntimeError("Invalid address {}".format(text))
+
+    area, word, bit = match.groups()
+    if bit is not None and int(bit) > BIT_INDEX_MASK:
+        raise RuntimeError("Invalid address {}".format(text))
+
+    return encode_addr(int(word), int(bit or 0), ADDR_AREAS.index(area)), bit is not None
+
+
+def is_blank(value) -> bool:
+    # empty cell, None from the xlsx readers or nan from pandas
+    return value is None or (isinstance(value, float) and value != value)
+
+
+class TypeDescriptor:
+    # what a type string means, compiled once per distinct type string
+    __slots__ = ('base_type', 'count', 'stride', 'hmi_type', 'is_bit', 'elements')
+
+    def __init__(self, base_type: str, count: int, stride: int, hmi_type: str, is_bit: bool, elements: tuple):
+        self.base_type = base_type
+        self.count = count
+        self.stride = stride
+        self.hmi_type = hmi_type
+        self.is_bit = is_bit
+        self.elements = elements
+
+
+@functools.lru_cache(maxsize=None)
+def compile_type(var_type: str) -> TypeDescriptor:
+    # stride is in encoded addresses (bits), hmi_type is None for types hmi_tag_table cannot hold,
+    # elements holds the (name suffix, address offset) of each array element, None for a non-array
+    if "ARRAY" in var_type:
+        base_type = get_array_type(var_type)
+        count = get_array_size(var_type)
+    else:
+        base_type = var_type
+        count = 1
+
+    stride = TYPE_BITS.get(base_type)
+    elements = None
+    if "ARRAY" in var_type and stride is not None:
+        elements = tuple((str(j), j * stride) for j in range(count))
+
+    return TypeDescriptor(base_type, count, stride, HMI_TYPES.get(base_type), "BOOL" in var_type, elements)
+
+
+def get_array_size(data: str) -> int:
+    tmp = data.split(' ')
+    return int(tmp[1].replace('[', '').replace(']',''))
+
+
+def get_array_type(data: str) -> int:
+    return data.split(' ')[3]
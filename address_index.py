@@ -0,0 +1,150 @@
+"""
+    Address Index:
+
+    Function:
+    - builds a sorted interval index over every address range the global
+      variables occupy, arrays included, across all register areas
+    - finds every pair of overlapping variables and the variables past the
+      end of their register area with one sort and one sweep, O(n log n)
+      plus the pairs found
+    - looks up the variables at an address with a binary search
+
+    How to use:
+    - in terminal, input "python address_index.py [template.xlsx] [--max-d 29999] [--lookup D10002 ...]"
+    - as a library, AddressIndex(rows) with the rows of global_var_table
+"""
+
+from array import array
+import argparse
+import bisect
+import heapq
+import os
+import sys
+import address_codec as codec
+
+
+# highest word of each register area that is checked, D0 - D29999 on the AS series
+DEFAULT_MAX_WORDS = {"D": 29999}
+
+
+def main(argv=None):
+
+    # parameter
+    parser = argparse.ArgumentParser(description="Check the address ranges of the global variables of a template")
+    parser.add_argument("input_name", nargs="?", default="global_variable_template.xlsx")
+    parser.add_argument("--max-d", type=int, default=DEFAULT_MAX_WORDS["D"],
+                        help="highest D register that can be allocated (default: %(default)s)")
+    parser.add_argument("--lookup", nargs="+", default=[], metavar="ADDR",
+                        help="print the variables at each address, e.g. D10002 or D10002.1")
+    args = parser.parse_args(argv)
+
+    # imported here, the generator imports this module itself
+    import global_variable_generator as gvg
+    curr_dir = os.path.dirname(os.path.abspath(__file__))
+    tables = gvg.generate(os.path.join(curr_dir, args.input_name))
+    index = AddressIndex(tables.global_var_table.rows())
+
+    for text in args.lookup:
+        addr, _ = codec.parse_addr(text)
+        names = [index.describe(i) for i in index.lookup(addr)]
+        print("{}: {}".format(text, ", ".join(names) or "-"))
+
+    if not print_report(index, dict(DEFAULT_MAX_WORDS, D=args.max_d)):
+        sys.exit(1)
+
+
+def print_report(index: "AddressIndex", max_words: dict = DEFAULT_MAX_WORDS) -> bool:
+    # returns True when every variable has its own address range inside its register area
+    overlaps = index.overlaps()
+    out_of_range = index.out_of_range(max_words)
+
+    for i, j in overlaps:
+        print("overlap: {} and {}".format(index.describe(i), index.describe(j)))
+    for i in out_of_range:
+        print("out of range: {}".format(index.describe(i)))
+
+    print("{} variables checked, {} overlaps, {} out of range".format(len(index), len(overlaps), len(out_of_range)))
+    return not overlaps and not out_of_range
+
+
+class AddressIndex:
+    # intervals [start, end) of encoded addresses sorted by start, an encoded address counts in bits
+    # within its register area (word << 4 | bit), so a range of bits is a range of encoded addresses
+    __slots__ = ('names', 'starts', 'ends', 'max_ends')
+
+    def __init__(self, rows):
+        names = []
+        starts = []
+        ends = []
+        for var_name, addr, _, var_type, _, _ in rows:
+            names.append(var_name)
+            starts.append(addr)
+            ends.append(addr + type_bits(var_type))
+
+        order = sorted(range(len(names)), key=starts.__getitem__)
+        self.names = [names[i] for i in order]
+        self.starts = array('q', (starts[i] for i in order))
+        self.ends = array('q', (ends[i] for i in order))
+
+        # furthest end of all intervals up to each position, lookups stop once it is behind the address
+        self.max_ends = array('q', self.ends)
+        for i in range(1, len(self.max_ends)):
+            if self.max_ends[i - 1] > self.max_ends[i]:
+                self.max_ends[i] = self.max_ends[i - 1]
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def overlaps(self) -> list:
+        # (i, j) for every pair of overlapping intervals, i < j, the heap holds the ends of the intervals
+        # still open at the start of j, each of them overlaps j
+        overlaps = []
+        active = []
+        for j, (start, end) in enumerate(zip(self.starts, self.ends)):
+            while active and active[0][0] <= start:
+                heapq.heappop(active)
+            overlaps += sorted((i, j) for _, i in active)
+            heapq.heappush(active, (end, j))
+        return overlaps
+
+    def out_of_range(self, max_words: dict = DEFAULT_MAX_WORDS) -> list:
+        limits = {codec.ADDR_AREAS.index(area): max_word for area, max_word in max_words.items()}
+        out_of_range = []
+        for i, end in enumerate(self.ends):
+            # the word holding the last bit, an area overflowing its word index counts as past its end
+            area = self.starts[i] >> codec.AREA_SHIFT
+            last_word = (end - 1 - (area << codec.AREA_SHIFT)) >> codec.BIT_INDEX_BITS
+            if area in limits and last_word > limits[area]:
+                out_of_range.append(i)
+        return out_of_range
+
+    def lookup(self, addr: int) -> list:
+        # positions of the intervals holding addr, for a word address that is any of its bits
+        end_addr = addr + 1 if addr & codec.BIT_INDEX_MASK else addr + (1 << codec.BIT_INDEX_BITS)
+        i = bisect.bisect_left(self.starts, end_addr)
+        found = []
+        while i > 0 and self.max_ends[i - 1] > addr:
+            i -= 1
+            if self.ends[i] > addr:
+                found.append(i)
+        return found[::-1]
+
+    def describe(self, i: int) -> str:
+        # "name (D10003 - D10005)", bit ranges are shown by their first and last bit
+        start, end = self.starts[i], self.ends[i]
+        is_bit = bool((start | end) & codec.BIT_INDEX_MASK)
+        last = end - 1 if is_bit else end - (1 << codec.BIT_INDEX_BITS)
+        if last == start:
+            return "{} ({})".format(self.names[i], codec.format_addr(start, is_bit))
+        return "{} ({} - {})".format(self.names[i], codec.format_addr(start, is_bit), codec.format_addr(last, is_bit))
+
+
+def type_bits(var_type: str) -> int:
+    descriptor = codec.compile_type(var_type)
+    if descriptor.stride is None:
+        raise RuntimeError("Invalid type {}".format(var_type))
+    return descriptor.count * descriptor.stride
+
+
+if __name__ == "__main__":
+    main()
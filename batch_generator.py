@@ -0,0 +1,145 @@
+"""
+    Batch Generator:
+
+    Function:
+    - generates the global variable and hmi tag tables of many templates,
+      e.g. one template per production line, across a pool of processes
+    - every template writes to its own output directory, named after its path
+      relative to the common directory of all templates
+    - prints a success, failure and timing summary of every template,
+      exits with 1 when any template failed
+
+    How to use:
+    - in terminal, input "python batch_generator.py templates/ --out-dir output"
+    - a glob can be used in place of a directory, e.g. "sites/*/line_*.xlsx"
+"""
+
+import argparse
+import concurrent.futures
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+import traceback
+import global_variable_generator as gvg
+import template_cache
+
+
+GLOB_VAR_TABLE_NAME = "global_variable_table.csv"
+HMI_TAG_TABLE_NAME = "hmi_tag.csv"
+
+
+def main(argv=None):
+
+    # parameter
+    parser = argparse.ArgumentParser(description="Generate ISPSoft global variables and HMI tags for many templates")
+    parser.add_argument("templates", help="directory of templates or a glob pattern")
+    parser.add_argument("--out-dir", required=True, help="one sub-directory per template is created here")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(),
+                        help="number of worker processes (default: %(default)s)")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the workbooks")
+    parser.add_argument("--reader", choices=("xml", "openpyxl"), default="xml",
+                        help="xlsx reader (default: %(default)s)")
+    parser.add_argument("--plc-name", default=gvg.DEFAULT_PLC_NAME,
+                        help="PLC link prefix of hmi tag addresses (default: %(default)s)")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream rows into the csv files instead of building the tables in memory")
+    args = parser.parse_args(argv)
+
+    templates = find_templates(args.templates)
+    if not templates:
+        raise RuntimeError("No templates found in {}".format(args.templates))
+
+    cache_dir = None
+    if not args.no_cache:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(gvg.__file__)), ".template_cache")
+
+    out_dirs = output_dirs(templates, args.out_dir)
+    start = time.perf_counter()
+    results = run_batch(templates, out_dirs, args.jobs, cache_dir, args.reader, args.plc_name, args.stream)
+    elapsed = time.perf_counter() - start
+
+    print_summary(results, elapsed)
+    if any(not result['ok'] for result in results):
+        sys.exit(1)
+
+
+def find_templates(pattern: str) -> list:
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, "*.xlsx")
+
+    # excel lock files (~$name.xlsx) are left beside templates that are open
+    templates = [path for path in glob.glob(pattern, recursive=True)
+                 if os.path.isfile(path) and not os.path.basename(path).startswith("~$")]
+    return sorted(os.path.abspath(path) for path in templates)
+
+
+def output_dirs(templates: list, out_dir: str) -> list:
+    # templates of the same name from different sites must not share an output directory
+    root = os.path.commonpath([os.path.dirname(path) for path in templates])
+    return [os.path.join(os.path.abspath(out_dir), os.path.splitext(os.path.relpath(path, root))[0])
+            for path in templates]
+
+
+def run_batch(templates: list, out_dirs: list, jobs: int, cache_dir: str, reader: str,
+              plc_name: str, stream: bool) -> list:
+    # results are returned in template order
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(generate_template, template, out_dir, cache_dir, reader, plc_name, stream)
+                   for template, out_dir in zip(templates, out_dirs)]
+        return [future.result() for future in futures]
+
+
+def generate_template(template: str, out_dir: str, cache_dir: str, reader: str,
+                      plc_name: str, stream: bool) -> dict:
+    # runs in a worker process, failures are reported in the result instead of raised
+    result = {'template': template, 'out_dir': out_dir, 'ok': True, 'error': None}
+    start = time.perf_counter()
+
+    try:
+        os.makedirs(out_dir, exist_ok=True)
+        glob_var_filename = os.path.join(out_dir, GLOB_VAR_TABLE_NAME)
+        hmi_tag_filename = os.path.join(out_dir, HMI_TAG_TABLE_NAME)
+
+        if cache_dir is None:
+            parsed = gvg.parse_tables(gvg.load_template(template, reader))
+        else:
+            parsed = gvg.read_template_cached(template, cache_dir, template_cache.DEFAULT_MAX_SIZE, reader)
+        table_rows = gvg.generate_table_rows(parsed)
+
+        # the "completed" lines of every worker would interleave, the summary replaces them
+        with contextlib.redirect_stdout(io.StringIO()):
+            if stream:
+                gvg.stream_tables_to_csv(table_rows, glob_var_filename, hmi_tag_filename, plc_name)
+            else:
+                global_var_table, hmi_tag_table = gvg.build_tables(table_rows)
+                gvg.write_glob_var_table_to_csv(glob_var_filename, global_var_table)
+                gvg.write_hmi_tag_table_to_csv(hmi_tag_filename, hmi_tag_table, plc_name)
+
+    except Exception as error:
+        result['ok'] = False
+        result['error'] = "".join(traceback.format_exception_only(type(error), error)).strip()
+
+    result['time_s'] = time.perf_counter() - start
+    return result
+
+
+def print_summary(results: list, elapsed: float) -> None:
+    root = os.path.commonpath([os.path.dirname(result['template']) for result in results])
+    names = [os.path.relpath(result['template'], root) for result in results]
+    width = max(len(name) for name in names)
+    for name, result in zip(names, results):
+        status = "ok" if result['ok'] else "FAILED"
+        print("{:<{}}  {:<6}  {:8.1f} ms  {}".format(name, width, status, result['time_s'] * 1000, result['out_dir']))
+        if not result['ok']:
+            print("    {}".format(result['error']))
+
+    failed = sum(not result['ok'] for result in results)
+    print("\n{} templates, {} succeeded, {} failed in {:.2f} s".format(
+        len(results), len(results) - failed, failed, elapsed))
+
+
+if __name__ == "__main__":
+    main()
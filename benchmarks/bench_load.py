@@ -0,0 +1,83 @@
+"""
+    Template Load Benchmark:
+
+    Function:
+    - compares the time taken to load a template using one pd.read_excel
+      call per sheet against the single-pass load_template, with both
+      the openpyxl and the standard library xml reader
+    - checks that all paths produce the same parsed data
+
+    To use:
+    - in terminal, input "python benchmarks/bench_load.py [template.xlsx] [repeat]"
+"""
+
+from array import array
+import sys
+import os
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import column_store
+import global_variable_generator as gvg
+
+
+def main():
+
+    template = sys.argv[1] if len(sys.argv) > 1 else "global_variable_template.xlsx"
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    read_excel_time = min(time_call(load_with_read_excel, template) for _ in range(repeat))
+    print("pd.read_excel x{}:        {:8.1f} ms".format(len(gvg.TEMPLATE_SHEETS), read_excel_time * 1000))
+
+    expected = parse_tables(load_with_read_excel(template))
+    for reader in ("openpyxl", "xml"):
+        load_template_time = min(time_call(gvg.load_template, template, reader) for _ in range(repeat))
+        if parse_tables(gvg.load_template(template, reader)) != expected:
+            raise RuntimeError("Parsed data differs between load paths")
+
+        print("load_template {:<8}   {:8.1f} ms  ({:.2f}x)".format(
+            reader + ":", load_template_time * 1000, read_excel_time / load_template_time))
+
+
+def load_with_read_excel(template: str) -> dict:
+    return {name: pd.read_excel(template, sheet_name=name) for name in gvg.TEMPLATE_SHEETS}
+
+
+def parse_tables(tables: dict) -> tuple:
+    return normalize((
+        gvg.read_var_table(tables["Constants"]),
+        gvg.read_var_table(tables["Shelf"]),
+        gvg.read_sensor_list_table(tables["Sensor List"]),
+        gvg.read_var_table(tables["Sensor Data"]),
+        gvg.read_var_table(tables["Pump"]),
+        gvg.read_io_mapping_table(tables["IO Mapping"]),
+        gvg.read_hmi_internal_table(tables["HMI Internal"]),
+    ))
+
+
+def normalize(data):
+    # pandas yields numpy scalars and nan where load_template yields python values and None
+    if isinstance(data, dict):
+        return {normalize(k): normalize(v) for k, v in data.items()}
+    if isinstance(data, column_store.ColumnStore):
+        return {name: normalize(getattr(data, name)) for name in slot_names(data)}
+    if isinstance(data, (list, tuple, array, bytearray)):
+        return [normalize(x) for x in data]
+    if pd.isna(data):
+        return None
+    return data.item() if hasattr(data, "item") else data
+
+
+def slot_names(data) -> list:
+    return [name for cls in type(data).__mro__ for name in getattr(cls, '__slots__', ())]
+
+
+def time_call(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+    Startup Benchmark:
+
+    Function:
+    - measures the cold-start wall time of the generator, a fresh python
+      process is started for every run so nothing is already imported
+    - compares the standard library xml reader against the openpyxl reader
+      and reports which heavy modules each run ended up importing
+
+    To use:
+    - in terminal, input "python benchmarks/bench_startup.py [template.xlsx] [repeat]"
+"""
+
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl")
+
+# runs the generator the same way main() does, then reports the loaded heavy modules
+RUN_SCRIPT = """
+import json, os, sys
+sys.path.insert(0, {root!r})
+import global_variable_generator as gvg
+gvg.main([{template!r}, "--no-cache", "--reader", {reader!r}])
+print(json.dumps([m for m in {modules!r} if m in sys.modules]))
+"""
+
+
+def main():
+
+    template = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT_DIR, "global_variable_template.xlsx"))
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    # main() writes its csv files beside the script, so a copy of the generator and its
+    # modules is run, the csv files of the repository are left alone
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for module in glob.glob(os.path.join(ROOT_DIR, "*.py")):
+            shutil.copy(module, tmp_dir)
+
+        for reader in ("xml", "openpyxl"):
+            times = []
+            for _ in range(repeat):
+                elapsed, modules = run_cold(tmp_dir, template, reader)
+                times.append(elapsed)
+            print("{:<8} best {:7.1f} ms  median {:7.1f} ms  imports: {}".format(
+                reader, min(times) * 1000, sorted(times)[len(times) // 2] * 1000, ", ".join(modules) or "-"))
+
+
+def run_cold(root: str, template: str, reader: str) -> tuple:
+    script = RUN_SCRIPT.format(root=root, template=template, reader=reader, modules=HEAVY_MODULES)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True)
+    elapsed = time.perf_counter() - start
+    return elapsed, json.loads(result.stdout.splitlines()[-1])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+    Generator Benchmark Suite:
+
+    Function:
+    - synthesizes templates over a sweep of shelf counts
+    - times and memory-profiles each stage of global_variable_generator.py:
+      load, parse, allocate, hmi expansion, generate and write
+    - allocate runs the variable sections (Constants, Pump, Shelf) as the
+      generator does, each one resolved once as a block and replicated,
+      hmi expansion expands the resolved blocks into hmi tags
+    - saves the results as json, with the log-log slope of every stage
+      between sweep points so super-linear behavior is visible
+
+    To use:
+    - in terminal, input "python benchmarks/run_benchmarks.py --shelves 10 100 1000 -o results.json"
+"""
+
+import argparse
+import contextlib
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import global_variable_generator as gvg
+from synthetic_template import write_template
+
+
+STAGES = ("load", "parse", "allocate", "hmi_expansion", "generate", "write")
+
+# sections made of template variables, the ones the allocate stage runs
+VAR_SECTIONS = ("Constants", "Pump", "Shelf")
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Benchmark global_variable_generator.py stages")
+    parser.add_argument("--shelves", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--vars-per-shelf", type=int, default=22)
+    parser.add_argument("--array-size", type=int, default=3)
+    parser.add_argument("--shelf-sensors", type=int, default=5)
+    parser.add_argument("--general-sensors", type=int, default=100)
+    parser.add_argument("--io-rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per stage, the fastest is kept")
+    parser.add_argument("-o", "--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for shelves in args.shelves:
+            params = {
+                'shelves': shelves,
+                'vars_per_shelf': args.vars_per_shelf,
+                'array_size': args.array_size,
+                'shelf_sensors': args.shelf_sensors,
+                'general_sensors': args.general_sensors,
+                'io_rows': args.io_rows,
+            }
+            template = os.path.join(tmp_dir, "template_{}.xlsx".format(shelves))
+            write_template(template, **params)
+
+            result = run_sweep_point(template, tmp_dir, args.repeat)
+            result['params'] = params
+            results.append(result)
+            print_result(result)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+        'scaling': scaling_slopes(results),
+    }
+    with open(args.output, mode='w') as file:
+        json.dump(report, file, indent=2)
+
+    print("results saved to {}".format(args.output))
+
+
+def run_sweep_point(template: str, tmp_dir: str, repeat: int) -> dict:
+    stages = {}
+    for stage, func in stage_funcs(template, tmp_dir):
+        # time without tracemalloc, its overhead would distort the timing
+        elapsed = min(time_call(func) for _ in range(repeat))
+
+        tracemalloc.start()
+        func()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        stages[stage] = {'time_s': elapsed, 'peak_kb': peak / 1024}
+
+    parsed = gvg.parse_tables(gvg.load_template(template))
+    global_var_table, hmi_tag_table = gvg.build_tables(gvg.generate_table_rows(parsed))
+    rows = len(global_var_table) + len(hmi_tag_table)
+    for stage in stages.values():
+        stage['time_per_row_us'] = stage['time_s'] / rows * 1e6
+
+    return {
+        'template_kb': os.path.getsize(template) / 1024,
+        'rows': {'global_var_table': len(global_var_table), 'hmi_tag_table': len(hmi_tag_table)},
+        'stages': stages,
+    }
+
+
+def stage_funcs(template: str, tmp_dir: str) -> list:
+    # each stage runs on the output of the previous one, computed once up front
+    tables = gvg.load_template(template)
+    parsed = gvg.parse_tables(tables)
+    blocks = resolve_blocks(parsed)
+    table_rows = list(gvg.generate_table_rows(parsed))
+    glob_var_path = os.path.join(tmp_dir, "global_variable_table.csv")
+    hmi_tag_path = os.path.join(tmp_dir, "hmi_tag.csv")
+
+    def write():
+        global_var_table, hmi_tag_table = gvg.build_tables(table_rows)
+        gvg.write_glob_var_table_to_csv(glob_var_path, global_var_table)
+        gvg.write_hmi_tag_table_to_csv(hmi_tag_path, hmi_tag_table, "{EtherLink1}1@")
+
+    return [
+        ("load", lambda: gvg.load_template(template)),
+        ("parse", lambda: gvg.parse_tables(tables)),
+        ("allocate", lambda: [row for section in VAR_SECTIONS for row in gvg.section_rows(parsed, section)]),
+        ("hmi_expansion", lambda: [row for block in blocks for rec in block for row in gvg.hmi_tag_rows(rec)]),
+        ("generate", lambda: list(gvg.generate_table_rows(parsed))),
+        ("write", quiet(write)),
+    ]
+
+
+def resolve_blocks(parsed: dict) -> list:
+    # the blocks var_section_rows resolves at address 0 before replicating them
+    return [list(gvg.resolve_var_section(parsed[key][1], 0)) for key in ('constants', 'pumps', 'shelfs')]
+
+
+def scaling_slopes(results: list) -> dict:
+    # slope of log(time) over log(rows) between consecutive sweep points, ~1 is linear
+    slopes = {stage: [] for stage in STAGES}
+    for prev, curr in zip(results, results[1:]):
+        prev_rows = sum(prev['rows'].values())
+        curr_rows = sum(curr['rows'].values())
+        for stage in STAGES:
+            prev_time = prev['stages'][stage]['time_s']
+            curr_time = curr['stages'][stage]['time_s']
+            if prev_rows == curr_rows or prev_time <= 0 or curr_time <= 0:
+                slopes[stage].append(None)
+                continue
+            slopes[stage].append(math.log(curr_time / prev_time) / math.log(curr_rows / prev_rows))
+
+    return slopes
+
+
+def print_result(result: dict) -> None:
+    print("shelves={} rows={}".format(result['params']['shelves'], sum(result['rows'].values())))
+    for stage, data in result['stages'].items():
+        print("  {:<14} {:10.2f} ms {:12.1f} KB peak {:8.3f} us/row".format(
+            stage, data['time_s'] * 1000, data['peak_kb'], data['time_per_row_us']))
+
+
+def quiet(func):
+    # the csv writers print a completion line, keep the benchmark output readable
+    def wrapper():
+        with open(os.devnull, mode='w') as devnull, contextlib.redirect_stdout(devnull):
+            func()
+    return wrapper
+
+
+def time_call(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+    Synthetic Template Generator:
+
+    Function:
+    - writes a valid template with the same seven sheets and columns
+      as global_variable_template.xlsx
+    - shelf count, variables per shelf, ARRAY sizes, sensor counts and
+      IO Mapping rows can be adjusted to build templates of any size
+    - sections start where they do in global_variable_template.xlsx (shelves
+      D10000, pumps D11000, sensors D12000, constants D20000, IO Mapping
+      D28000), a section that outgrows its space moves the ones after it up,
+      with the default sizes every section stays within D0 - D29999 up to
+      250 shelves
+
+    To use:
+    - in terminal, input "python benchmarks/synthetic_template.py output.xlsx --shelves 1000"
+"""
+
+import argparse
+import openpyxl
+
+
+VAR_HEADER = ["base_addr", "variable_name", "addr_offset", "type", "init_value", "hmi_tag", "comment"]
+
+# sections in address order with their base word in global_variable_template.xlsx
+LAYOUT = (("Shelf", 10000), ("Pump", 11000), ("Sensors", 12000), ("Constants", 20000), ("IO Mapping", 28000))
+SECTION_ALIGN = 1000
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Write a synthetic global variable template")
+    parser.add_argument("output")
+    parser.add_argument("--shelves", type=int, default=10)
+    parser.add_argument("--vars-per-shelf", type=int, default=22)
+    parser.add_argument("--array-size", type=int, default=3)
+    parser.add_argument("--shelf-sensors", type=int, default=5)
+    parser.add_argument("--general-sensors", type=int, default=100)
+    parser.add_argument("--sensor-fields", type=int, default=6)
+    parser.add_argument("--pump-vars", type=int, default=12)
+    parser.add_argument("--io-rows", type=int, default=100)
+    args = parser.parse_args()
+
+    write_template(args.output, shelves=args.shelves, vars_per_shelf=args.vars_per_shelf,
+                   array_size=args.array_size, shelf_sensors=args.shelf_sensors,
+                   general_sensors=args.general_sensors, sensor_fields=args.sensor_fields,
+                   pump_vars=args.pump_vars, io_rows=args.io_rows)
+
+
+def write_template(
+    filename: str, shelves: int = 10, vars_per_shelf: int = 22, array_size: int = 3,
+    shelf_sensors: int = 5, general_sensors: int = 100, sensor_fields: int = 6,
+    pump_vars: int = 12, io_rows: int = 100) -> None:
+
+    workbook = openpyxl.Workbook(write_only=True)
+
+    shelf_vars = [make_var("v{}".format(i), i, array_size) for i in range(vars_per_shelf)]
+    pump_vars = [make_var("pump_v{}".format(i), i, array_size) for i in range(pump_vars)]
+    sensor_vars = [("f{}".format(i), 1, "WORD", 0, False) for i in range(sensor_fields)]
+    n_sensors = shelves * shelf_sensors + general_sensors
+    # sensors start from the word after their base address
+    bases = section_bases({
+        "Shelf": shelves * sum(var[1] for var in shelf_vars),
+        "Pump": sum(var[1] for var in pump_vars),
+        "Sensors": 1 + n_sensors * sensor_fields,
+        "Constants": 4,
+        "IO Mapping": io_rows,
+    })
+
+    constants = [
+        ("shelf_no", 1, "WORD", shelves, True),
+        ("shelf_reg_size", 1, "WORD", 50, True),
+        ("snsr_no", 1, "WORD", n_sensors, False),
+        ("snsr_data_reg_size", 1, "WORD", sensor_fields, False),
+    ]
+    write_var_sheet(workbook.create_sheet("Constants"), bases["Constants"], constants)
+    write_var_sheet(workbook.create_sheet("Shelf"), bases["Shelf"], shelf_vars)
+
+    sheet = workbook.create_sheet("Sensor List")
+    sheet.append(["base_addr", "shelf_sensor", "general_sensor"])
+    for i in range(max(shelf_sensors, general_sensors)):
+        sheet.append([
+            bases["Sensors"] if i == 0 else None,
+            "sPres{}".format(i) if i < shelf_sensors else None,
+            "gFlow{}".format(i) if i < general_sensors else None,
+        ])
+
+    write_var_sheet(workbook.create_sheet("Sensor Data"), "-", sensor_vars)
+    write_var_sheet(workbook.create_sheet("Pump"), bases["Pump"], pump_vars)
+
+    sheet = workbook.create_sheet("IO Mapping")
+    sheet.append(["variable_name", "addr", "type", "init_value", "hmi_tag", "comment"])
+    for i in range(io_rows):
+        if i % 4 == 3:
+            sheet.append(["IO_x{}".format(i), "X{}.{}".format(i // 64, (i // 4) % 16), "BOOL", "FALSE", None, None])
+        else:
+            sheet.append(["IO_d{}".format(i), "D{}".format(bases["IO Mapping"] + i), "WORD", -1, "x" if i % 2 else None, None])
+
+    sheet = workbook.create_sheet("HMI Internal")
+    sheet.append(["base_addr", "var_name", "var_type", "addr_offset", "comment"])
+    for i in range(10):
+        sheet.append([1000 if i == 0 else None, "HMI_{}".format(i), "WORD" if i % 3 == 0 else "BIT", 1, None])
+
+    workbook.save(filename)
+
+
+def section_bases(sizes: dict) -> dict:
+    # base word of each section, a section starts at its base in the real template or, when the
+    # section before it reaches past that, at the next multiple of SECTION_ALIGN after it
+    bases = {}
+    end = 0
+    for section, base in LAYOUT:
+        bases[section] = max(base, -(-end // SECTION_ALIGN) * SECTION_ALIGN)
+        end = bases[section] + sizes[section]
+    return bases
+
+
+def make_var(name: str, i: int, array_size: int) -> tuple:
+    # cycle through the variable kinds found in real templates, two out of three are hmi tags
+    hmi_tag = i % 3 != 0
+    kind = i % 4
+    if kind == 0:
+        return name, 1, "WORD", 0, hmi_tag
+    if kind == 1:
+        return name, 1, "BOOL", "FALSE", hmi_tag
+    # array names end in "Arr" so expanded element names cannot collide with other variables
+    name += "Arr"
+    if kind == 2:
+        return name, array_size, "ARRAY [{}] OF WORD".format(array_size), "[{}(0)]".format(array_size), hmi_tag
+    return (name, (array_size + 15) // 16, "ARRAY [{}] OF BOOL".format(array_size),
+            "[{}(FALSE)]".format(array_size), hmi_tag)
+
+
+def write_var_sheet(sheet, base_addr, variables: list) -> None:
+    sheet.append(VAR_HEADER)
+    for i, (name, addr_offset, var_type, init_value, hmi_tag) in enumerate(variables):
+        sheet.append([
+            base_addr if i == 0 else None, name, addr_offset, var_type, init_value,
+            "x" if hmi_tag else None, None
+        ])
+
+
+if __name__ == "__main__":
+    main()
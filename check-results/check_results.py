@@ -1,21 +1,29 @@
 """
 
     Function:
-    - reads the results generated from 2 different scripts
-    - checks if the results are the same
+    - runs 2 different generator scripts in-process and captures the
+      global_variable_table.csv and hmi_tag.csv they would write, in memory
+    - checks if the results are the same, row by row and column by column
 
     To use:
     - run in same directory as scripts to be checked
-    - in terminal, input "python check-results.py script1.py script2.py"
+    - in terminal, input "python check-results/check_results.py script.py template.xlsx"
 
 """
 
-from typing import Union
-import sys
-import os
+import builtins
 import csv
-import pandas as pd
-import numpy as np
+import importlib.util
+import inspect
+import io
+import os
+import sys
+
+
+GLOB_VAR_TABLE_NAME = "global_variable_table.csv"
+HMI_TAG_TABLE_NAME = "hmi_tag.csv"
+MAX_REPORTED_ROWS = 20
+
 
 def main():
 
@@ -29,56 +37,146 @@ def main():
         new_script = "global_variable_generator.py"
         new_template = "global_variable_template.xlsx"
 
-    #runs files to generate global_variable_table.csv and hmi_tag.csv
-    os.system("python {} {}".format(old_script,old_template))
+    #runs both generators in-process, their csv output is kept in memory
+    old_tables = generate_in_memory(old_script, old_template)
     print("{} ran successfully\n".format(old_script))
-    os.system("mv global_variable_table.csv old_global_variable_table.csv")
-    os.system("mv hmi_tag.csv old_hmi_tag.csv")
 
-    os.system("python {} {}".format(new_script,new_template))
+    new_tables = generate_in_memory(new_script, new_template)
     print("{} ran successfully\n".format(new_script))
-    os.system("mv global_variable_table.csv new_global_variable_table.csv")
-    os.system("mv hmi_tag.csv new_hmi_tag.csv")
-
-    #extract names as tables
-    old_plc_table = pd.read_csv("old_global_variable_table.csv")
-    new_plc_table = pd.read_csv("new_global_variable_table.csv")
-    old_hmi_table = pd.read_csv("old_hmi_tag.csv")
-    new_hmi_table = pd.read_csv("new_hmi_tag.csv")
-
-    old_plc_names = pd.DataFrame(old_plc_table['Identifiers'])
-    new_plc_names = pd.DataFrame(new_plc_table['Identifiers'])
-    old_hmi_names = pd.DataFrame(old_hmi_table['Define Name'])
-    new_hmi_names = pd.DataFrame(new_hmi_table['Define Name'])
 
     #check if plc tables are equal and find inconsistencies
-    plc_difference = dataframe_difference(old_plc_names,new_plc_names)
-
-    if len(plc_difference) == 0:
-        print ("Global Variable Tables are consistent\n")
-
-    else :
-        print ("Global Variable Tables are inconsistent\n")
-
-        print (plc_difference)
+    plc_consistent = report_difference(
+        "Global Variable Tables", old_tables[GLOB_VAR_TABLE_NAME], new_tables[GLOB_VAR_TABLE_NAME], key_column=1)
 
     #check if hmi tables are equal and find inconsistencies
-    hmi_difference = dataframe_difference(old_plc_names,new_plc_names)
-    
-    if len(hmi_difference) == 0:
-        print ("HMI Tag tables are consistent\n")
-
-    else :
-        print ("HMI Tag tables are inconsistent\n")
-        
-        print (hmi_difference)
+    hmi_consistent = report_difference(
+        "HMI Tag tables", old_tables[HMI_TAG_TABLE_NAME], new_tables[HMI_TAG_TABLE_NAME], key_column=0)
 
-def dataframe_difference(df1, df2):
+    if not (plc_consistent and hmi_consistent):
+        sys.exit(1)
 
-    compare = df1.merge(df2, how='outer', indicator=True)
-    difference = compare[compare['_merge'] != 'both']
 
-    return difference
+def generate_in_memory(script: str, template: str) -> dict:
+    # import the generator as a library, returns {file name: list of csv rows}
+    script = os.path.abspath(script)
+    module = import_script(script)
+
+    if hasattr(module, "generate"):
+        tables = module.generate(template)
+        return {
+            GLOB_VAR_TABLE_NAME: [module.GLOB_VAR_HEADER] + csv_text_rows(tables.glob_var_csv_rows()),
+            HMI_TAG_TABLE_NAME: [module.HMI_TAG_HEADER] + csv_text_rows(tables.hmi_tag_csv_rows()),
+        }
+
+    # older generators only have main(), any file it opens for writing is replaced by an in-memory buffer
+    outputs = {}
+
+    def capture_open(file, mode='r', *args, **kwargs):
+        if 'w' not in mode:
+            return builtins.open(file, mode, *args, **kwargs)
+        buffer = CapturedFile()
+        outputs[os.path.basename(file)] = buffer
+        return buffer
+
+    module.open = capture_open
+    argv = sys.argv
+    try:
+        if inspect.signature(module.main).parameters:
+            # the cache is skipped so a checker run leaves nothing behind
+            module.main([template, "--no-cache"])
+        else:
+            sys.argv = [script, template]
+            module.main()
+    finally:
+        sys.argv = argv
+        del module.open
+
+    return {name: list(csv.reader(io.StringIO(buffer.text))) for name, buffer in outputs.items()}
+
+
+def csv_text_rows(rows: list) -> list:
+    # values as the csv writer would write them
+    return [["" if x is None else str(x) for x in row] for row in rows]
+
+
+def import_script(script: str):
+    # generators import their sibling modules, so their directory goes on the path
+    script_dir = os.path.dirname(script)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+
+    module_name = "checked_{}".format(os.path.splitext(os.path.basename(script))[0])
+    spec = importlib.util.spec_from_file_location(module_name, script)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class CapturedFile(io.StringIO):
+    # keeps its text after being closed by the generator's "with open(...)" block
+
+    def close(self) -> None:
+        self.text = self.getvalue()
+        super().close()
+
+
+def report_difference(title: str, old_rows: list, new_rows: list, key_column: int) -> bool:
+    difference = table_difference(old_rows, new_rows, key_column)
+
+    if not any(difference.values()):
+        print ("{} are consistent\n".format(title))
+        return True
+
+    print ("{} are inconsistent\n".format(title))
+    header = new_rows[0] if new_rows else old_rows[0]
+
+    for label in ("removed", "added"):
+        keys = difference[label]
+        print ("  {} {} rows".format(len(keys), label))
+        for key in keys[:MAX_REPORTED_ROWS]:
+            print ("    {}".format(key))
+
+    changed = difference['changed']
+    print ("  {} changed rows".format(len(changed)))
+    for key, columns in changed[:MAX_REPORTED_ROWS]:
+        print ("    {}".format(key))
+        for column, old_value, new_value in columns:
+            print ("      {}: {!r} -> {!r}".format(header[column], old_value, new_value))
+    print ()
+
+    return False
+
+
+def table_difference(old_rows: list, new_rows: list, key_column: int) -> dict:
+    # rows are keyed by their identifier, only rows whose hashes differ are compared column by column
+    old_index = index_rows(old_rows, key_column)
+    new_index = index_rows(new_rows, key_column)
+
+    removed = [key for key in old_index if key not in new_index]
+    added = [key for key in new_index if key not in old_index]
+    changed = []
+    for key, (new_hash, new_row) in new_index.items():
+        if key not in old_index:
+            continue
+        old_hash, old_row = old_index[key]
+        if old_hash == new_hash and old_row == new_row:
+            continue
+        columns = [(i, old_value, new_value)
+                   for i, (old_value, new_value) in enumerate(zip(old_row, new_row))
+                   if old_value != new_value]
+        changed.append((key, columns))
+
+    return {'removed': removed, 'added': added, 'changed': changed}
+
+
+def index_rows(rows: list, key_column: int) -> dict:
+    header, body = rows[0], rows[1:]
+    index = {}
+    for row in body:
+        # rows without a comment are written one column short
+        row = tuple(row) + ("",) * (len(header) - len(row))
+        index[row[key_column]] = (hash(row), row)
+    return index
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
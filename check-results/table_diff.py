@@ -0,0 +1,248 @@
+"""
+
+    Function:
+    - compares 2 generated csv files, e.g. global_variable_table.csv before
+      and after a template change, without loading either into memory
+    - rows are keyed by their identifier, each file is sorted by key in
+      chunks that are spilled to temporary files as sorted runs, the runs are
+      merged back with heapq.merge and both files are walked side by side
+    - rows are compared as raw text, only rows that differ are parsed
+    - reports removed, added and changed rows, and how many rows changed in
+      each column, memory is bounded by the chunk size
+
+    To use:
+    - in terminal, input "python check-results/table_diff.py old.csv new.csv [--chunk-rows 200000]"
+    - the key column is found by name (Identifiers, Define Name), or given with --key
+
+"""
+
+import argparse
+import csv
+import heapq
+import itertools
+import os
+import sys
+import tempfile
+
+
+DEFAULT_CHUNK_ROWS = 200000
+# characters read from a file at once, smaller for the sorted runs since all of them are read side by side
+BATCH_SIZE = 1 << 20
+RUN_BATCH_SIZE = 1 << 16
+MAX_REPORTED_ROWS = 20
+
+# identifier column of global_variable_table.csv and hmi_tag.csv
+KEY_COLUMNS = ("Identifiers", "Define Name")
+
+
+def main(argv=None):
+
+    # parameter
+    parser = argparse.ArgumentParser(description="Compare 2 generated csv tables row by row")
+    parser.add_argument("old_name")
+    parser.add_argument("new_name")
+    parser.add_argument("--key", help="name of the column rows are keyed by (default: {})".format(
+        " or ".join(KEY_COLUMNS)))
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                        help="rows sorted in memory at once (default: %(default)s)")
+    parser.add_argument("--tmp-dir", help="directory of the sorted runs (default: system temp)")
+    args = parser.parse_args(argv)
+    if args.chunk_rows < 1:
+        parser.error("--chunk-rows must be at least 1")
+
+    summary = table_diff(args.old_name, args.new_name, args.key, args.chunk_rows, args.tmp_dir)
+    title = "{} and {}".format(os.path.basename(args.old_name), os.path.basename(args.new_name))
+    if not print_summary(title, summary):
+        sys.exit(1)
+
+
+class DiffSummary:
+    # counts of every kind of difference, and the first MAX_REPORTED_ROWS of each
+    __slots__ = ('header', 'counts', 'column_counts', 'samples')
+
+    def __init__(self, header: list):
+        self.header = header
+        self.counts = {'removed': 0, 'added': 0, 'changed': 0}
+        self.column_counts = [0] * len(header)
+        self.samples = {'removed': [], 'added': [], 'changed': []}
+
+    def add(self, label: str, key: str, detail) -> None:
+        self.counts[label] += 1
+        if label == 'changed':
+            for column, _, _ in detail:
+                self.column_counts[column] += 1
+        if len(self.samples[label]) < MAX_REPORTED_ROWS:
+            self.samples[label].append((key, detail))
+
+    def is_consistent(self) -> bool:
+        return not any(self.counts.values())
+
+
+def table_diff(old_filename: str, new_filename: str, key: str = None, chunk_rows: int = DEFAULT_CHUNK_ROWS,
+               tmp_dir: str = None) -> DiffSummary:
+    old_header = read_header(old_filename)
+    new_header = read_header(new_filename)
+    key_column = key_column_of(new_header, key)
+    if key_column >= len(old_header) or old_header[key_column] != new_header[key_column]:
+        raise RuntimeError("Key column {} is not in {}".format(new_header[key_column], old_filename))
+
+    # columns missing in one of the files compare as empty
+    summary = DiffSummary(max(old_header, new_header, key=len))
+    with tempfile.TemporaryDirectory(prefix="table_diff_", dir=tmp_dir) as run_dir:
+        old_records = sorted_records(old_filename, key_column, chunk_rows, run_dir)
+        new_records = sorted_records(new_filename, key_column, chunk_rows, run_dir)
+        for label, row_key, detail in diff_records(old_records, new_records):
+            summary.add(label, row_key, detail)
+    return summary
+
+
+def read_header(filename: str) -> list:
+    with open(filename, newline='') as file:
+        header = next(csv.reader(file), None)
+    if not header:
+        raise RuntimeError("{} has no header".format(filename))
+    return header
+
+
+def key_column_of(header: list, key: str = None) -> int:
+    names = [key] if key else KEY_COLUMNS
+    for name in names:
+        if name in header:
+            return header.index(name)
+    raise RuntimeError("None of the columns {} is in the header {}".format(", ".join(names), header))
+
+
+def sorted_records(filename: str, key_column: int, chunk_rows: int, run_dir: str):
+    # (key, record) of every row of a csv file sorted by key, records are kept as their raw text and
+    # only parsed when they differ, every full chunk is sorted and spilled to run_dir, the last one
+    # stays in memory
+    runs = []
+    chunk = []
+    with open(filename, newline='') as file:
+        batches = keyed_batches(file, key_column)
+        header = next(batches, [])
+        chunk += header[1:]
+        for batch in batches:
+            chunk += batch
+            if len(chunk) >= chunk_rows:
+                chunk.sort()
+                runs.append(spill_run(chunk, run_dir))
+                chunk = []
+    chunk.sort()
+    runs.append(chunk)
+
+    if len(runs) == 1:
+        return iter(runs[0])
+    return heapq.merge(*(run if isinstance(run, list) else read_run(run, key_column) for run in runs))
+
+
+def keyed_batches(file, key_column: int, batch_size: int = BATCH_SIZE):
+    # lists of (key, record), records of a batch without quotes are split in bulk, only records
+    # with quotes need the csv parser
+    for records in read_records(file, batch_size):
+        if '"' in "".join(records):
+            keys = [record_key(record, key_column) for record in records]
+        else:
+            keys = [record.split(",", key_column + 1)[key_column] for record in records]
+        yield list(zip(keys, records))
+
+
+def read_records(file, batch_size: int = BATCH_SIZE):
+    # lists of csv records as their raw text without the line break, a quoted field can span several
+    # lines, a record is complete once its quotes are balanced since quotes inside a field are doubled
+    pending = ""
+    while True:
+        lines = file.readlines(batch_size)
+        if not lines:
+            break
+        if pending or '"' in "".join(lines):
+            records = []
+            for line in lines:
+                line = pending + line
+                if line.count('"') % 2:
+                    pending = line
+                    continue
+                pending = ""
+                records.append(line.rstrip("\r\n"))
+        else:
+            records = [line.rstrip("\r\n") for line in lines]
+        if "" in records:
+            records = [record for record in records if record]
+        yield records
+    if pending:
+        yield [pending.rstrip("\r\n")]
+
+
+def record_key(record: str, key_column: int) -> str:
+    if '"' in record:
+        return parse_record(record)[key_column]
+    return record.split(",", key_column + 1)[key_column]
+
+
+def parse_record(record: str) -> list:
+    return next(csv.reader([record]))
+
+
+def spill_run(chunk: list, run_dir: str) -> str:
+    fd, filename = tempfile.mkstemp(suffix=".csv", dir=run_dir)
+    with open(fd, mode='w', newline='') as file:
+        file.writelines(record + "\n" for _, record in chunk)
+    return filename
+
+
+def read_run(filename: str, key_column: int):
+    with open(filename, newline='') as file:
+        for batch in keyed_batches(file, key_column, RUN_BATCH_SIZE):
+            yield from batch
+
+
+def diff_records(old_records, new_records):
+    # merge join of 2 key sorted (key, record) streams, yields (label, key, detail), detail is the row
+    # of a removed or added key and the (column, old value, new value) of a changed one
+    old = next(old_records, None)
+    new = next(new_records, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            yield 'removed', old[0], parse_record(old[1])
+            old = next(old_records, None)
+        elif old is None or new[0] < old[0]:
+            yield 'added', new[0], parse_record(new[1])
+            new = next(new_records, None)
+        else:
+            # rows without a comment are written one column short, missing columns compare as empty
+            if old[1] != new[1]:
+                columns = [(i, old_value, new_value) for i, (old_value, new_value)
+                           in enumerate(itertools.zip_longest(parse_record(old[1]), parse_record(new[1]),
+                                                              fillvalue=""))
+                           if old_value != new_value]
+                if columns:
+                    yield 'changed', new[0], columns
+            old = next(old_records, None)
+            new = next(new_records, None)
+
+
+def print_summary(title: str, summary: DiffSummary) -> bool:
+    if summary.is_consistent():
+        print ("{} are consistent\n".format(title))
+        return True
+
+    print ("{} are inconsistent\n".format(title))
+    for label in ("removed", "added"):
+        print ("  {} {} rows".format(summary.counts[label], label))
+        for key, _ in summary.samples[label]:
+            print ("    {}".format(key))
+
+    columns = ", ".join("{}: {}".format(name, count)
+                        for name, count in zip(summary.header, summary.column_counts) if count)
+    print ("  {} changed rows{}".format(summary.counts['changed'], " ({})".format(columns) if columns else ""))
+    for key, columns in summary.samples['changed']:
+        print ("    {}".format(key))
+        for column, old_value, new_value in columns:
+            print ("      {}: {!r} -> {!r}".format(summary.header[column], old_value, new_value))
+    print ()
+
+    return False
+
+
+if __name__ == "__main__":
+    main()
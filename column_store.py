@@ -0,0 +1,117 @@
+"""
+    Column Store:
+
+    Function:
+    - tables of the generator stored column by column, parsed template
+      sheets (VarTable, IoTable) and generated records (RecordTable)
+    - kept in their own module so the parsed tables pickled into the template
+      cache resolve to the same classes however the generator is started
+"""
+
+from array import array
+import sys
+
+
+class ColumnStore:
+    # rows stored column by column, type strings are kept once and referenced by a small code,
+    # a name that appears again overwrites its earlier row in place
+    __slots__ = ('names', 'index', 'type_codes', 'type_names', 'type_lookup', 'comments')
+
+    def __init__(self):
+        self.names = []
+        self.index = {}
+        self.type_codes = array('H')
+        self.type_names = []
+        self.type_lookup = {}
+        self.comments = []
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def types(self) -> list:
+        return [self.type_names[x] for x in self.type_codes]
+
+    def _add_row(self, name: str, var_type: str, comment) -> int:
+        type_code = self.type_lookup.get(var_type)
+        if type_code is None:
+            type_code = self.type_lookup[var_type] = len(self.type_names)
+            self.type_names.append(var_type)
+        comment = sys.intern(comment) if isinstance(comment, str) else None
+
+        row = self.index.get(name)
+        if row is None:
+            row = self.index[name] = len(self.names)
+            self.names.append(name)
+            self.type_codes.append(type_code)
+            self.comments.append(comment)
+            return None
+
+        self.type_codes[row] = type_code
+        self.comments[row] = comment
+        return row
+
+
+class VarTable(ColumnStore):
+    # parsed rows of a template sheet that allocates addresses from a base address
+    __slots__ = ('addr_offsets', 'init_values', 'hmi_tags')
+
+    def __init__(self):
+        super().__init__()
+        self.addr_offsets = array('q')
+        self.init_values = []
+        self.hmi_tags = bytearray()
+
+    def append(self, name: str, addr_offset, var_type: str, init_value, hmi_tag: bool, comment) -> None:
+        row = self._add_row(name, var_type, comment)
+        if row is None:
+            self.addr_offsets.append(int(addr_offset))
+            self.init_values.append(init_value)
+            self.hmi_tags.append(hmi_tag)
+        else:
+            self.addr_offsets[row] = int(addr_offset)
+            self.init_values[row] = init_value
+            self.hmi_tags[row] = hmi_tag
+
+
+class RecordTable(ColumnStore):
+    # generated records of global_var_table or hmi_tag_table with encoded addresses
+    __slots__ = ('addrs', 'is_bits', 'init_values')
+
+    def __init__(self):
+        super().__init__()
+        self.addrs = array('q')
+        self.is_bits = bytearray()
+        self.init_values = []
+
+    def append(self, name: str, addr: int, is_bit: bool, var_type: str, init_value, comment) -> int:
+        row = self._add_row(name, var_type, comment)
+        if row is None:
+            self.addrs.append(addr)
+            self.is_bits.append(is_bit)
+            self.init_values.append(init_value)
+        else:
+            self.addrs[row] = addr
+            self.is_bits[row] = is_bit
+            self.init_values[row] = init_value
+        return row
+
+    def rows(self):
+        # yields (name, addr, is_bit, type, init_value, comment)
+        return zip(self.names, self.addrs, self.is_bits, self.types(), self.init_values, self.comments)
+
+
+class IoTable(RecordTable):
+    # parsed rows of the IO Mapping sheet, addresses are given in the template
+    __slots__ = ('hmi_tags',)
+
+    def __init__(self):
+        super().__init__()
+        self.hmi_tags = bytearray()
+
+    def append(self, name: str, addr: int, is_bit: bool, var_type: str, init_value, comment, hmi_tag: bool) -> int:
+        row = super().append(name, addr, is_bit, var_type, init_value, comment)
+        if row is None:
+            self.hmi_tags.append(hmi_tag)
+        else:
+            self.hmi_tags[row] = hmi_tag
+        return row
@@ -10,316 +10,743 @@
     - configure parameter in global_variable_template.xlsx
     - run this script at the same directory as global_variable_template.xlsx
     - global_variable_table.csv will be generated upon script completion
+    - with --incremental only the sections of sheets changed since the last
+      incremental run are regenerated, the rest is reused from the csv files
+    - with --watch the script keeps running and regenerates incrementally
+      every time the template is saved
+    - --link PREFIX=PATH, repeated, writes one hmi_tag table per PLC link
+    - --register-image also writes the initial value of every D register
+      into register_image.bin, see register_image.py
+    - --index also writes a name and address lookup index beside each
+      table, see tag_index.py
+
+    As a library:
+    - generate(template) takes a template path, the workbook bytes or tables
+      that are already loaded, and returns both tables in memory
 """
 
-from typing import Union
-import sys
+import argparse
+import concurrent.futures
+import contextlib
+import gzip
+import io
+import json
+import itertools
 import os
+import shutil
+import threading
 import csv
-import pandas as pd
-import numpy as np
+from address_codec import AREA_SHIFT, HMI_AREA, compile_type, encode_addr, format_addr, is_blank, parse_addr
+import column_store
+from column_store import IoTable, RecordTable, VarTable
+import incremental_build
+import stage_profiler
+import table_export
+import template_cache
+import template_watcher
+import xlsx_reader
 
 
-def main():
+TEMPLATE_SHEETS = (
+    "Constants", "Shelf", "Sensor List", "Sensor Data", "Pump", "IO Mapping", "HMI Internal"
+)
+
+# sections in the order they are written, with the template sheets each one is generated from
+SECTIONS = ("Constants", "Pump", "Shelf", "Sensors", "IO Mapping", "HMI Internal")
+SECTION_SHEETS = {
+    "Constants": ("Constants",),
+    "Pump": ("Pump",),
+    "Shelf": ("Constants", "Shelf"),
+    "Sensors": ("Constants", "Sensor List", "Sensor Data"),
+    "IO Mapping": ("IO Mapping",),
+    "HMI Internal": ("HMI Internal",),
+}
+
+# tables a generated row belongs to
+GLOB_VAR_TABLE = 0
+HMI_TAG_TABLE = 1
+
+DEFAULT_PLC_NAME = "{EtherLink1}1@"
+
+GLOB_VAR_HEADER = ["Class", "Identifiers", "Address", "Type", "Initial Value", "Comment"]
+HMI_TAG_HEADER = ['Define Name', 'Type', 'Address', 'Description']
+
+
+def main(argv=None):
 
     # parameter
-    if len(sys.argv) == 2:
-        input_name = sys.argv[1]
-    else:
-        input_name = "global_variable_template.xlsx"
+    parser = argparse.ArgumentParser(description="Generate ISPSoft global variables and HMI tags")
+    parser.add_argument("input_name", nargs="?", default="global_variable_template.xlsx")
+    parser.add_argument("--no-cache", action="store_true", help="always parse the workbook")
+    parser.add_argument("--clear-cache", action="store_true", help="remove all cached templates")
+    parser.add_argument("--cache-size", type=int, default=template_cache.DEFAULT_MAX_SIZE // (1024 * 1024),
+                        help="cache size cap in MB (default: %(default)s)")
+    parser.add_argument("--reader", choices=("xml", "openpyxl"), default="xml",
+                        help="xlsx reader, xml needs only the standard library (default: %(default)s)")
+    parser.add_argument("--plc-name", default=DEFAULT_PLC_NAME,
+                        help="PLC link prefix of hmi tag addresses (default: %(default)s)")
+    parser.add_argument("--link", action="append", type=parse_link, default=[], metavar="PREFIX=PATH",
+                        help="write an hmi_tag table with this PLC link prefix to PATH, can be repeated, "
+                             "replaces the single hmi_tag.csv")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream rows into the csv files instead of building the tables in memory")
+    parser.add_argument("--incremental", action="store_true",
+                        help="regenerate only the sections of sheets changed since the last incremental run")
+    parser.add_argument("--gzip", action="store_true", help="also write a gzip copy of every csv file")
+    parser.add_argument("--columnar", choices=sorted(table_export.FORMATS),
+                        help="also write both resolved tables column by column, parquet needs pyarrow, "
+                             "hmi_tag_table named after the first --link path")
+    parser.add_argument("--register-image", action="store_true",
+                        help="also write the initial values of the D registers into register_image.bin")
+    parser.add_argument("--index", action="store_true",
+                        help="also write a name and address lookup index (.idx) beside both tables, "
+                             "beside the first --link path for hmi_tag_table")
+    parser.add_argument("--check-addresses", action="store_true",
+                        help="stop before writing when variables overlap or run past the end of their register area")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and regenerate incrementally whenever the template is saved")
+    parser.add_argument("--profile", action="store_true",
+                        help="report time, peak memory and rows of each stage and section")
+    parser.add_argument("--profile-json", metavar="PATH", help="save the profile report as json")
+    parser.add_argument("--profile-cprofile", metavar="PATH",
+                        help="also run cProfile and dump its stats to PATH")
+    args = parser.parse_args(argv)
+    if args.columnar:
+        try:
+            table_export.check_format(args.columnar)
+        except RuntimeError as error:
+            parser.error(str(error))
+    for option, value in (("--check-addresses", args.check_addresses), ("--link", args.link),
+                          ("--gzip", args.gzip), ("--columnar", args.columnar),
+                          ("--register-image", args.register_image), ("--index", args.index)):
+        if value and (args.stream or args.incremental or args.watch):
+            parser.error("{} needs the full tables, it cannot be combined with --stream, --incremental or --watch"
+                         .format(option))
+
+    input_name = args.input_name
     global_var_table_name = "global_variable_table.csv"
     hmi_tag_table_name = "hmi_tag.csv"
-    hmi_tag_plc_name = "{EtherLink1}1@"
+    register_image_name = "register_image.bin"
+    manifest_name = "generator_manifest.json"
+    hmi_tag_plc_name = args.plc_name
 
     curr_dir = os.path.dirname(os.path.abspath(__file__))
     dir_name = os.path.join(curr_dir, input_name)
+    cache_dir = os.path.join(curr_dir, ".template_cache")
+
+    profiler = None
+    if args.profile or args.profile_json or args.profile_cprofile:
+        profiler = stage_profiler.StageProfiler(args.profile_cprofile)
+        profiler.start()
+
+    if args.clear_cache:
+        template_cache.clear_cache(cache_dir)
+
+    if args.watch:
+        # parsed sheets and generated sections stay in memory between saves
+        state = {}
+        template_watcher.watch(dir_name, lambda: generate_incremental(
+            dir_name, global_var_table_name, hmi_tag_table_name, manifest_name,
+            hmi_tag_plc_name, args.reader, state=state))
+    elif args.incremental:
+        # only the sections of changed sheets are generated, the rest is reused from the last run
+        generate_incremental(dir_name, global_var_table_name, hmi_tag_table_name, manifest_name,
+                             hmi_tag_plc_name, args.reader, profiler)
+    else:
+        generate_full(args, dir_name, cache_dir, global_var_table_name, hmi_tag_table_name,
+                      register_image_name if args.register_image else None, profiler)
+
+    if profiler is not None:
+        profiler.stop()
+        profiler.print_report()
+
+        if args.profile_json:
+            report = profiler.report()
+            report['template'] = input_name
+            with open(args.profile_json, mode='w') as file:
+                json.dump(report, file, indent=2)
+
+
+def generate_full(args, dir_name: str, cache_dir: str, global_var_table_name: str, hmi_tag_table_name: str,
+                  register_image_name: str = None, profiler=None) -> None:
+    hmi_tag_plc_name = args.plc_name
+
+    # read data from tables, unchanged templates are served from the cache
+    if args.no_cache:
+        with profile_stage(profiler, "load"):
+            tables = load_template(dir_name, args.reader)
+        with profile_stage(profiler, "parse"):
+            parsed = parse_tables(tables)
+    else:
+        with profile_stage(profiler, "read template (cached)"):
+            parsed = read_template_cached(dir_name, cache_dir, args.cache_size * 1024 * 1024, args.reader)
 
-    # extract tables from excel
-    constant_table = pd.read_excel(dir_name, sheet_name="Constants")
-    shelf_table = pd.read_excel(dir_name, sheet_name="Shelf")
-    sensor_list_table = pd.read_excel(dir_name, sheet_name="Sensor List")
-    sensor_data_table = pd.read_excel(dir_name, sheet_name="Sensor Data")
-    pump_data_table = pd.read_excel(dir_name, sheet_name="Pump")
-    io_mapping_table = pd.read_excel(dir_name, sheet_name="IO Mapping")
-    hmi_data_table = pd.read_excel(dir_name, sheet_name="HMI Internal")
-
-    # read data from tables
-    constant_base_addr, constants = read_var_table(constant_table)
-    shelf_base_addr, shelfs = read_var_table(shelf_table)
-    sensor_base_addr, sensors = read_sensor_list_table(sensor_list_table)
-    sensor_data = read_var_table(sensor_data_table)[1]
-    pump_base_addr, pumps = read_var_table(pump_data_table)
-    io_data = read_io_mapping_table(io_mapping_table)
-    hmi_base_addr, hmi_internal = read_hmi_internal_table(hmi_data_table)
-
-    # define common properties
-    shelf_no = constants['shelf_no']['init_value']
-    assert("shelf_no" in constants) == True
-
-    global_var_table = {}
-    hmi_tag_table = {}
-
-    # parse constants and write into global_var_table
-    constant_curr_addr = constant_base_addr
-    for var_name in constants:
-        var_data = constants[var_name]
-        
-        addr = "D{}".format(round(float(constant_curr_addr), 1) if "BOOL" in var_data['type'] else int (constant_curr_addr) )
-        constant_curr_addr += int(var_data['addr_offset'])
-        
-        write_rec_glob_var_table(global_var_table, var_name, addr, var_data['type'], var_data['init_value'], var_data['comment'])
-
-    # parse pump_data and write into global_var_table
-    pump_curr_addr = pump_base_addr
-    for var_name in pumps:
-        pump_data = pumps[var_name]
-
-        addr = "D{}".format( round(float(pump_curr_addr), 1) if "BOOL" in pump_data['type'] else int (pump_curr_addr) )
-        pump_curr_addr += int(pump_data['addr_offset'])
-
-        write_rec_glob_var_table(global_var_table, var_name, addr, pump_data['type'], pump_data['init_value'], pump_data['comment'])
-        
-    # parse shelfs and write into global_var_table
-    shelf_curr_addr = shelf_base_addr
-    for i in range(shelf_no):
-        for var_name in shelfs:
-            shelf_data = shelfs[var_name]
-            name = "s{}_{}".format(i, var_name)
-
-            addr = "D{}".format( round(float(shelf_curr_addr), 1) if "BOOL" in shelf_data['type'] else int (shelf_curr_addr))
-            shelf_curr_addr += int(shelf_data['addr_offset'])
-
-            write_rec_glob_var_table(global_var_table, name, addr, shelf_data['type'], shelf_data['init_value'], shelf_data['comment'])
-    
-    # parse constants and write into hmi_tag_table
-    constant_curr_addr = constant_base_addr
-    for var_name in constants:
-        var_data = constants[var_name]
-
-        # filter those that should go into hmi_tag
-        if not var_data['hmi_tag']:
-            constant_curr_addr += var_data['addr_offset']
-            continue
+    table_rows = generate_table_rows(parsed, profiler)
+
+    if args.stream:
+        # write rows straight into both csv files without holding the tables in memory
+        with profile_stage(profiler, "stream tables to csv"):
+            stream_tables_to_csv(table_rows, global_var_table_name, hmi_tag_table_name, hmi_tag_plc_name)
+    else:
+        with profile_stage(profiler, "build tables") as stage:
+            global_var_table, hmi_tag_table = build_tables(table_rows)
+            stage['rows'] = len(global_var_table) + len(hmi_tag_table)
+
+        if args.check_addresses:
+            # imported here, only needed with --check-addresses
+            import address_index
+            with profile_stage(profiler, "check addresses"):
+                if not address_index.print_report(address_index.AddressIndex(global_var_table.rows())):
+                    raise RuntimeError("Address check failed")
+
+        # one hmi_tag table per plc link, hmi_tag.csv with --plc-name by default
+        links = args.link or [(hmi_tag_plc_name, hmi_tag_table_name)]
+        write_outputs(global_var_table, hmi_tag_table, global_var_table_name, links,
+                      args.gzip, args.columnar, register_image_name, args.index, profiler)
+
+
+def generate_incremental(template: str, glob_var_filename: str, hmi_tag_filename: str, manifest_filename: str,
+                         plc_name: str, reader: str = "xml", profiler=None, state: dict = None) -> list:
+    # regenerates the sections whose sheets changed since the last run and splices them between
+    # the unchanged sections of the previous csv files, returns the regenerated sections,
+    # a long running caller passes a state dict that keeps the last run in memory between calls
+    curr_dir = os.path.dirname(os.path.abspath(__file__))
+    outputs = [os.path.join(curr_dir, glob_var_filename), os.path.join(curr_dir, hmi_tag_filename)]
+    manifest_path = os.path.join(curr_dir, manifest_filename)
+    generator = incremental_build.source_digest([os.path.abspath(__file__), column_store.__file__,
+                                                   xlsx_reader.__file__])
+    if state is None:
+        state = {}
+
+    with profile_stage(profiler, "fingerprint sheets"):
+        fingerprints = incremental_build.sheet_fingerprints(template, TEMPLATE_SHEETS)
+        if state:
+            old_fingerprints, old_sections = state['sheets'], state['section_texts']
+        else:
+            manifest = incremental_build.load_manifest(manifest_path, generator, plc_name, outputs)
+            old_sections = manifest and incremental_build.split_sections(outputs, manifest)
+            old_fingerprints = manifest['sheets'] if old_sections else {}
+
+    # tables parsed by an earlier call are kept per sheet
+    parsed_sheets = state.get('parsed', {})
+    section_names = state.get('section_names', {})
+
+    changed_sheets = {sheet for sheet in TEMPLATE_SHEETS if fingerprints[sheet] != old_fingerprints.get(sheet)}
+    sections = [section for section in SECTIONS if changed_sheets.intersection(SECTION_SHEETS[section])]
+    if not sections:
+        print("up to date: {}, {}".format(glob_var_filename, hmi_tag_filename))
+        return []
+
+    sheets = [sheet for sheet in TEMPLATE_SHEETS if any(sheet in SECTION_SHEETS[x] for x in sections)]
+    load_sheets = [sheet for sheet in sheets if sheet in changed_sheets or sheet not in parsed_sheets]
+    with profile_stage(profiler, "load"):
+        tables = load_template(template, reader, load_sheets)
+    with profile_stage(profiler, "parse"):
+        for sheet in load_sheets:
+            parsed_sheets[sheet] = parse_tables(tables, [sheet])
+    parsed = {key: table for sheet in sheets for key, table in parsed_sheets[sheet].items()}
+
+    section_texts = {}
+    for section, rows in generate_sections(parsed, sections):
+        with profile_stage(profiler, "section " + section) as stage:
+            section_texts[section], section_names[section] = render_section_csv(rows, plc_name)
+            stage['rows'] = sum(len(names) for names in section_names[section])
+
+    # a duplicate name overwrites the earlier row in a full build, that cannot be spliced
+    for section in SECTIONS:
+        if section not in section_texts:
+            section_texts[section] = old_sections[section]
+            if section not in section_names:
+                section_names[section] = csv_section_names(old_sections[section])
+    if has_duplicate_names(section_names[x] for x in SECTIONS):
+        state.clear()
+        incremental_build.remove_manifest(manifest_path)
+        global_var_table, hmi_tag_table = build_tables(generate_table_rows(parse_tables(load_template(template, reader))))
+        write_text_atomic(outputs[0], [csv_text([GLOB_VAR_HEADER]),
+                                       csv_text(glob_var_csv_row(row) for row in global_var_table.rows())])
+        write_text_atomic(outputs[1], [csv_text([HMI_TAG_HEADER]),
+                                       csv_text(hmi_tag_csv_row(row, plc_name) for row in hmi_tag_table.rows())])
+        print("completed: global_variable_table.csv")
+        print("completed: hmi_tag_table.csv")
+        return list(SECTIONS)
+
+    headers = [csv_text([GLOB_VAR_HEADER]), csv_text([HMI_TAG_HEADER])]
+    with profile_stage(profiler, "write"):
+        for i, output in enumerate(outputs):
+            write_text_atomic(output, [headers[i]] + [section_texts[section][i] for section in SECTIONS])
+
+    incremental_build.store_manifest(manifest_path, {
+        'generator': generator,
+        'plc_name': plc_name,
+        'sheets': fingerprints,
+        'headers': [len(x) for x in headers],
+        'sections': [[section, *(len(x) for x in section_texts[section])] for section in SECTIONS],
+        'outputs': [incremental_build.file_digest(output) for output in outputs],
+    })
+    state.update(sheets=fingerprints, parsed=parsed_sheets, section_texts=section_texts, section_names=section_names)
+
+    print("regenerated: {}".format(", ".join(sections)))
+    print("completed: global_variable_table.csv")
+    print("completed: hmi_tag_table.csv")
+    return sections
 
-        # check if variable is an array
-        if "ARRAY" in var_data['type']:
-            array_size = get_array_size(var_data['type'])
-            array_type = get_array_type(var_data['type'])
-            constant_arr_addr = constant_curr_addr
 
-            for j in range(array_size):
-                name = f"{var_name}{j}"
-                addr_offset = calc_addr_offset_hmi_tag(is_array=True, var_type=array_type, 
-                                                       offset=var_data['addr_offset'])
-                var_type = translate_var_type_hmi_tag(var_type=array_type)
+def write_outputs(global_var_table, hmi_tag_table, glob_var_filename: str, links: list,
+                  compress: bool = False, columnar: str = None, register_image_filename: str = None,
+                  index: bool = False, profiler=None) -> None:
+    # links are (plc_name, filename) of each hmi_tag table, all files are written concurrently,
+    # each one to a temporary file renamed over the output once complete,
+    # the columnar and index files of hmi_tag_table are named after the first link
+    curr_dir = os.path.dirname(os.path.abspath(__file__))
+    hmi_tag_filenames = [filename for _, filename in links]
+    hmi_tag_filename = hmi_tag_filenames[0]
+
+    tasks = [(write_csv_atomic, glob_var_filename, GLOB_VAR_HEADER,
+              (glob_var_csv_row(row) for row in global_var_table.rows()))]
+    tasks += [(write_csv_atomic, filename, HMI_TAG_HEADER, rows) for filename, rows
+              in zip(hmi_tag_filenames, hmi_tag_csv_link_rows(hmi_tag_table, [plc_name for plc_name, _ in links]))]
+    if columnar:
+        # addresses of the columnar hmi_tag table carry no plc link prefix
+        extension = table_export.FORMATS[columnar]
+        for filename, columns in ((glob_var_filename, table_columns(global_var_table)),
+                                  (hmi_tag_filename, table_columns(hmi_tag_table, init_values=False))):
+            tasks.append((write_columns_atomic, os.path.splitext(filename)[0] + extension, columns, columnar))
+    if register_image_filename:
+        tasks.append((write_register_image_atomic, register_image_filename, global_var_table.rows()))
+    if index:
+        # addresses of the hmi_tag index carry no plc link prefix
+        for filename, table in ((glob_var_filename, global_var_table), (hmi_tag_filename, hmi_tag_table)):
+            tasks.append((write_index_atomic, os.path.splitext(filename)[0] + ".idx", table))
+
+    with profile_stage(profiler, "write {} files".format(len(tasks))) as stage:
+        run_concurrently(tasks, curr_dir)
+        stage['rows'] = len(global_var_table) + len(hmi_tag_table) * len(links)
+
+    if compress:
+        # compressed from the finished csv files, zlib runs outside the gil so these really run in parallel
+        gzip_tasks = [(write_gzip_atomic, filename + ".gz", os.path.join(curr_dir, filename))
+                      for filename in [glob_var_filename] + hmi_tag_filenames]
+        with profile_stage(profiler, "gzip {} files".format(len(gzip_tasks))):
+            run_concurrently(gzip_tasks, curr_dir)
+        tasks += gzip_tasks
+
+    for _, filename, *_ in tasks:
+        print("completed: {}".format(filename))
+
+
+def run_concurrently(tasks: list, curr_dir: str) -> None:
+    # tasks are (func, filename, *args), filename is relative to curr_dir
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(tasks)) as executor:
+        futures = [executor.submit(func, os.path.join(curr_dir, filename), *args) for func, filename, *args in tasks]
+        for future in futures:
+            future.result()
+
+
+@contextlib.contextmanager
+def atomic_output(filename: str, mode: str = 'w', **kwargs):
+    # written to a temporary file renamed over filename once complete,
+    # readers see either the old or the new content, never a partial write
+    tmp_filename = "{}.{}.{}.tmp".format(filename, os.getpid(), threading.get_ident())
+    try:
+        with open(tmp_filename, mode, **kwargs) as file:
+            yield file
+        os.replace(tmp_filename, filename)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp_filename)
+        raise
+
+
+def write_text_atomic(filename: str, texts: list) -> None:
+    with atomic_output(filename, mode='w', newline='') as file:
+        file.writelines(texts)
+
+
+def write_csv_atomic(filename: str, header: list, rows) -> None:
+    with atomic_output(filename, mode='w', newline='') as file:
+        writer = csv.writer(file, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        writer.writerow(header)
+        writer.writerows(rows)
 
-                addr = hmi_tag_plc_name + \
-                       "D{}".format( round(float(constant_arr_addr), 1) if "BOOL" in var_data['type'] else int (constant_arr_addr) )
-                
-                constant_arr_addr += addr_offset
-                write_rec_hmi_tag_table(hmi_tag_table, name, var_type, addr, var_data['comment'])
 
-            constant_curr_addr += var_data['addr_offset']
+def write_gzip_atomic(filename: str, source: str) -> None:
+    # the gzip header carries no timestamp, unchanged tables give unchanged files
+    with open(source, mode='rb') as src, atomic_output(filename, mode='wb') as file:
+        with gzip.GzipFile(filename="", mode='wb', fileobj=file, mtime=0) as gzip_file:
+            shutil.copyfileobj(src, gzip_file, 1 << 20)
+
+
+def write_columns_atomic(filename: str, columns: dict, fmt: str) -> None:
+    with atomic_output(filename, mode='wb') as file:
+        table_export.write_columns(file, columns, fmt)
 
-        # non-array variable
-        else:
-            name = f"{var_name}"
-            addr_offset = calc_addr_offset_hmi_tag(is_array=False, var_type=var_data['type'], 
-                                                offset=var_data['addr_offset'])
-            var_type = translate_var_type_hmi_tag(var_type=var_data['type'])
-            addr = hmi_tag_plc_name + \
-                "D{}".format( round(float(constant_curr_addr), 1) if "BOOL" in shelf_data['type'] else int (constant_curr_addr))
-
-            write_rec_hmi_tag_table(hmi_tag_table, name, var_type, addr, var_data['comment'])
-            constant_curr_addr += addr_offset
-    
-    # parse pump_data and write into hmi_tag_table
-    pump_curr_addr = pump_base_addr
-    for var_name in pumps:
-        pump_data = pumps[var_name]
-
-        # filter those that should go into hmi_tag
-        if not pump_data['hmi_tag']:
-            pump_curr_addr += pump_data['addr_offset']
-            continue
 
-        # check if variable is an array
-        if "ARRAY" in pump_data['type']:
-            array_size = get_array_size(pump_data['type'])
-            array_type = get_array_type(pump_data['type'])
-            pump_arr_addr = pump_curr_addr
+def write_register_image_atomic(filename: str, rows) -> None:
+    # imported here, only needed with --register-image
+    import register_image
+    with atomic_output(filename, mode='wb') as file:
+        register_image.write_image(file, rows)
 
-            for j in range(array_size):
-                name = f"{var_name}{j}"
-                addr_offset = calc_addr_offset_hmi_tag(is_array=True, var_type=array_type, 
-                                                       offset=pump_data['addr_offset'])
-                var_type = translate_var_type_hmi_tag(var_type=array_type)
 
-                addr = hmi_tag_plc_name + \
-                       "D{}".format( round(float(pump_arr_addr), 1) if "BOOL" in pump_data['type'] else int (pump_arr_addr) )
-                
-                pump_arr_addr += addr_offset
-                write_rec_hmi_tag_table(hmi_tag_table, name, var_type, addr, pump_data['comment'])
+def write_index_atomic(filename: str, table) -> None:
+    # imported here, only needed with --index
+    import tag_index
+    with atomic_output(filename, mode='wb') as file:
+        tag_index.write_index(file, table)
 
-            pump_curr_addr += pump_data['addr_offset']
 
-        # non-array variable
+def table_columns(table, init_values: bool = True) -> dict:
+    columns = {
+        'name': table.names,
+        'addr': table.addrs,
+        'address': [format_addr(addr, is_bit) for addr, is_bit in zip(table.addrs, table.is_bits)],
+        'is_bit': table.is_bits,
+        'type': table.types(),
+    }
+    if init_values:
+        columns['init_value'] = table.init_values
+    columns['comment'] = table.comments
+    return columns
+
+
+def render_section_csv(rows, plc_name: str) -> tuple:
+    # csv text of a section in both tables, and the names written into each
+    glob_var_rows = []
+    hmi_tag_rows = []
+    for table, row in rows:
+        if table == GLOB_VAR_TABLE:
+            glob_var_rows.append(row)
         else:
-            name = f"{var_name}"
-            addr_offset = calc_addr_offset_hmi_tag(is_array=False, var_type=pump_data['type'], 
-                                                   offset=pump_data['addr_offset'])
-            var_type = translate_var_type_hmi_tag(var_type=pump_data['type'])
-
-            addr = hmi_tag_plc_name + \
-                   "D{}".format( round(float(pump_curr_addr), 1) if "BOOL" in shelf_data['type'] else int (pump_curr_addr))
-
-            write_rec_hmi_tag_table(hmi_tag_table, name, var_type, addr, pump_data['comment'])
-            pump_curr_addr += addr_offset
-        
-    # parse shelfs and write into hmi_tag_table
-    shelf_curr_addr = shelf_base_addr
-    for i in range(shelf_no):
-        for var_name in shelfs:
-            shelf_data = shelfs[var_name]
-
-            # filter those that should go into hmi_tag
-            if not shelf_data['hmi_tag']:
-                shelf_curr_addr += shelf_data['addr_offset']
-                continue
-
-            # check if variable is an array
-            if "ARRAY" in shelf_data['type']:
-                array_size = get_array_size(shelf_data['type'])
-                array_type = get_array_type(shelf_data['type'])
-                shelf_arr_addr = shelf_curr_addr
-
-                for j in range(array_size):
-                    name = f"s{i}_{var_name}{j}"
-
-                    addr_offset = calc_addr_offset_hmi_tag(is_array=True, var_type=array_type,
-                                                           offset=shelf_data['addr_offset'])
-                    var_type = translate_var_type_hmi_tag(var_type=array_type)
-
-                    addr = hmi_tag_plc_name + \
-                           "D{}".format( round(float(shelf_arr_addr),1) if "BOOL" in shelf_data['type'] else int (shelf_arr_addr))
-                    
-                    shelf_arr_addr += addr_offset
-                    write_rec_hmi_tag_table(hmi_tag_table, name, var_type, addr, shelf_data['comment'])
-
-                shelf_curr_addr += shelf_data['addr_offset']
-
-            # non-array variable
-            else:
-                name = f"s{i}_{var_name}"
-
-                addr_offset = calc_addr_offset_hmi_tag(is_array=False, var_type=array_type, offset=shelf_data['addr_offset'])
-                var_type = translate_var_type_hmi_tag(var_type=shelf_data['type'])
-
-                addr = hmi_tag_plc_name + \
-                        "D{}".format( round(float(shelf_curr_addr), 1) if "BOOL" in shelf_data['type'] else int (shelf_curr_addr))
-
-                write_rec_hmi_tag_table(hmi_tag_table, name, var_type, addr, shelf_data['comment'])
-                shelf_curr_addr += addr_offset
-
-    # parse sensors, sensor_data and write into global_var_table
-    # parse sensors, sensor_data and write into hmi_tag_table
-    addr_offset = 1
-    for i in range(shelf_no):
-        for snsr_name in sensors['shelf_sensors']:
-            for j, var_name in enumerate(sensor_data):
-                data = sensor_data[var_name]
-                name = "snsr_s{}_{}_{}".format(i, snsr_name, var_name)
-                
-                # for global_var_table
-                addr = "D{}".format(sensor_base_addr + addr_offset)
-                write_rec_glob_var_table(global_var_table, name, addr, data['type'], data['init_value'], data['comment'])
-
-                # for hmi_tag_table
-                addr = hmi_tag_plc_name + "D{}".format(sensor_base_addr + addr_offset)
-                write_rec_hmi_tag_table(hmi_tag_table, name, data['type'], addr, data['comment'])
-
-                addr_offset += 1
-
-    for snsr_name in sensors['other_sensors']:
-        for i, var_name in enumerate(sensor_data):
-            data = sensor_data[var_name]
-            name = "snsr_{}_{}".format(snsr_name, var_name)
-
-            # for global_var_table
-            addr = "D{}".format(sensor_base_addr + addr_offset)
-            write_rec_glob_var_table(global_var_table, name, addr, data['type'], data['init_value'], data['comment'])
-            
-            # for hmi_tag_table
-            addr = hmi_tag_plc_name + "D{}".format(sensor_base_addr + addr_offset)
-            write_rec_hmi_tag_table(hmi_tag_table, name, data['type'], addr, data['comment'])
-            
-            addr_offset += 1
-
-    
+            hmi_tag_rows.append(row)
+
+    texts = (csv_text(glob_var_csv_row(row) for row in glob_var_rows),
+             csv_text(hmi_tag_csv_row(row, plc_name) for row in hmi_tag_rows))
+    return texts, ([row[0] for row in glob_var_rows], [row[0] for row in hmi_tag_rows])
+
+
+def csv_text(rows) -> str:
+    # same dialect as the csv files are written with
+    buffer = io.StringIO(newline='')
+    csv.writer(buffer, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL).writerows(rows)
+    return buffer.getvalue()
+
+
+def csv_section_names(texts: tuple) -> tuple:
+    # names are the 2nd column of global_var_table and the 1st column of hmi_tag_table
+    glob_var_text, hmi_tag_text = texts
+    return ([row[1] for row in csv.reader(io.StringIO(glob_var_text, newline=''))],
+            [row[0] for row in csv.reader(io.StringIO(hmi_tag_text, newline=''))])
+
+
+def has_duplicate_names(section_names) -> bool:
+    glob_var_names = set()
+    hmi_tag_names = set()
+    n_glob_var = n_hmi_tag = 0
+    for glob_var_section, hmi_tag_section in section_names:
+        glob_var_names.update(glob_var_section)
+        hmi_tag_names.update(hmi_tag_section)
+        n_glob_var += len(glob_var_section)
+        n_hmi_tag += len(hmi_tag_section)
+    return len(glob_var_names) != n_glob_var or len(hmi_tag_names) != n_hmi_tag
+
+
+def generate(template, plc_name: str = DEFAULT_PLC_NAME) -> "GeneratedTables":
+    # template is a path, the workbook bytes or a file object, or tables that are already loaded:
+    # {sheet name: DataFrame or {column: values}} or the output of parse_tables()
+    global_var_table, hmi_tag_table = build_tables(generate_table_rows(parse_template(template)))
+    return GeneratedTables(global_var_table, hmi_tag_table, plc_name)
+
+
+def parse_template(template) -> dict:
+    if isinstance(template, dict):
+        if 'constants' in template:
+            return template
+        return parse_tables(template)
+
+    if isinstance(template, (bytes, bytearray)):
+        template = io.BytesIO(template)
+    return parse_tables(load_template(template))
+
+
+class GeneratedTables:
+    # result of generate(), rows are kept encoded until they are requested
+    __slots__ = ('global_var_table', 'hmi_tag_table', 'plc_name')
+
+    def __init__(self, global_var_table, hmi_tag_table, plc_name: str):
+        self.global_var_table = global_var_table
+        self.hmi_tag_table = hmi_tag_table
+        self.plc_name = plc_name
+
+    def glob_var_csv_rows(self) -> list:
+        return [glob_var_csv_row(row) for row in self.global_var_table.rows()]
+
+    def hmi_tag_csv_rows(self) -> list:
+        return [hmi_tag_csv_row(row, self.plc_name) for row in self.hmi_tag_table.rows()]
+
+    def write_csv(self, glob_var_filename: str, hmi_tag_filename: str) -> None:
+        # relative filenames are relative to the working directory, nothing is printed
+        write_csv_atomic(glob_var_filename, GLOB_VAR_HEADER,
+                         (glob_var_csv_row(row) for row in self.global_var_table.rows()))
+        write_csv_atomic(hmi_tag_filename, HMI_TAG_HEADER,
+                         (hmi_tag_csv_row(row, self.plc_name) for row in self.hmi_tag_table.rows()))
+
+
+def profile_stage(profiler, name: str):
+    # yields the stage record, a throwaway dict when profiling is off
+    if profiler is None:
+        return contextlib.nullcontext({})
+    return profiler.stage(name)
+
+
+def generate_table_rows(parsed: dict, profiler=None):
+    # yields (GLOB_VAR_TABLE, row) and (HMI_TAG_TABLE, row) for every record of both tables,
+    # a row is (name, addr, is_bit, type, init_value, comment) with an encoded address
+    for section, section_rows in generate_sections(parsed):
+        if profiler is None:
+            yield from section_rows
+            continue
+
+        # each section is run to completion on its own so it can be measured
+        with profiler.stage("section " + section) as stage:
+            section_rows = list(section_rows)
+            stage['rows'] = len(section_rows)
+        yield from section_rows
+
+
+def generate_sections(parsed: dict, sections=SECTIONS) -> list:
+    # parsed only needs the tables of the sheets the requested sections are generated from
+    return [(section, section_rows(parsed, section)) for section in sections]
+
+
+def section_rows(parsed: dict, section: str):
+    if section == "Constants":
+        constant_base_addr, constants = parsed['constants']
+        return var_section_rows(constants, constant_base_addr)
+    if section == "Pump":
+        pump_base_addr, pumps = parsed['pumps']
+        return var_section_rows(pumps, pump_base_addr)
+    if section == "Shelf":
+        shelf_base_addr, shelfs = parsed['shelfs']
+        return var_section_rows(shelfs, shelf_base_addr, get_shelf_no(parsed), "s{}_")
+    if section == "Sensors":
+        sensor_base_addr, sensors = parsed['sensors']
+        return sensor_section_rows(sensor_base_addr, sensors, parsed['sensor_data'], get_shelf_no(parsed))
+    if section == "IO Mapping":
+        return io_section_rows(parsed['io_data'])
+    if section == "HMI Internal":
+        hmi_base_addr, hmi_internal = parsed['hmi_internal']
+        return hmi_internal_section_rows(hmi_base_addr, hmi_internal)
+    raise RuntimeError("Unknown section {}".format(section))
+
+
+def get_shelf_no(parsed: dict) -> int:
+    _, constants = parsed['constants']
+    assert("shelf_no" in constants.index) == True
+    return constants.init_values[constants.index['shelf_no']]
+
+
+def var_section_rows(var_table, base_addr: int, repeat: int = 1, prefix: str = ""):
+    # each resolved variable is written into both global_var_table and hmi_tag_table,
+    # a repeated section (e.g. per shelf) is resolved once as a block at address 0, every repeat
+    # is that block shifted by the block size and renamed with its prefix
+    block = list(resolve_var_section(var_table, 0))
+    glob_var_block = [glob_var_row(var_rec) for var_rec in block]
+    hmi_tag_block = [row for var_rec in block for row in hmi_tag_rows(var_rec)]
+    block_size = encode_addr(sum(var_table.addr_offsets))
+
+    for i in range(repeat):
+        var_prefix = prefix.format(i)
+        shift = encode_addr(base_addr) + i * block_size
+        yield from [(GLOB_VAR_TABLE, (var_prefix + var_name, shift + addr, is_bit, var_type, init_value, comment))
+                    for var_name, addr, is_bit, var_type, init_value, comment in glob_var_block]
+        yield from [(HMI_TAG_TABLE, (var_prefix + var_name, shift + addr, is_bit, hmi_type, None, comment))
+                    for var_name, addr, is_bit, hmi_type, _, comment in hmi_tag_block]
+
+
+def sensor_section_rows(sensor_base_addr: int, sensors: dict, sensor_data, shelf_no: int):
+    # parse sensors, sensor_data and write into global_var_table and hmi_tag_table,
+    # names are the product of shelf, sensor and sensor field, addresses a running counter
+    # from the word after the base address, each shelf is emitted as one batch
+    sensor_fields = list(zip(sensor_data.names, sensor_data.types(), sensor_data.init_values, sensor_data.comments))
+    shelf_block = sensor_block(sensors['shelf_sensors'], sensor_fields)
+    other_block = sensor_block(sensors['other_sensors'], sensor_fields)
+
+    addr_step = encode_addr(1)
+    addr = encode_addr(sensor_base_addr + 1)
+    blocks = [("snsr_s{}_".format(i), shelf_block) for i in range(shelf_no)] + [("snsr_", other_block)]
+    for prefix, block in blocks:
+        rows = [(prefix + name, block_addr, False, var_type, init_value, comment)
+                for block_addr, (name, var_type, init_value, comment)
+                in zip(range(addr, addr + len(block) * addr_step, addr_step), block)]
+        addr += len(block) * addr_step
+
+        yield from [(GLOB_VAR_TABLE, row) for row in rows]
+        yield from [(HMI_TAG_TABLE, (name, block_addr, False, var_type, None, comment))
+                    for name, block_addr, _, var_type, _, comment in rows]
+
+
+def sensor_block(sensor_names: list, sensor_fields: list) -> list:
+    # (sensor_field name, type, init_value, comment) of every field of every sensor
+    return [("{}_{}".format(snsr_name, var_name), var_type, init_value, comment)
+            for snsr_name, (var_name, var_type, init_value, comment) in itertools.product(sensor_names, sensor_fields)]
+
+
+def io_section_rows(io_data):
     # parse io_data and write into global_var_table & hmi_tag_table
-    for io_name in io_data:
-        io = io_data[io_name]
-        write_rec_glob_var_table(global_var_table, io_name, io['addr'], io['type'], io['init_value'], io['comment'])
+    for io_rec, hmi_tag in zip(io_data.rows(), io_data.hmi_tags):
+        yield GLOB_VAR_TABLE, io_rec
 
-        if io['hmi_tag']:
-            addr = hmi_tag_plc_name + io['addr']
-            write_rec_hmi_tag_table(hmi_tag_table, io_name, io['type'], addr, io['comment'])
+        if hmi_tag:
+            io_name, addr, is_bit, var_type, _, comment = io_rec
+            yield HMI_TAG_TABLE, (io_name, addr, is_bit, var_type, None, comment)
 
 
+def hmi_internal_section_rows(hmi_base_addr: int, hmi_internal):
     # parse hmi_internal and write into hmi_tag_table
-    hmi_curr_addr =  hmi_base_addr
-    for var_name in hmi_internal:
-
-        addr = "$"
-        hmi_data = hmi_internal[var_name]
-        if hmi_data['type'] == "BIT":
-            addr += str(round(float(hmi_curr_addr), 1))
-        elif hmi_data['type'] == "WORD":
-            addr += str(hmi_curr_addr)
-        else:
+    hmi_curr_addr = encode_addr(hmi_base_addr, area=HMI_AREA)
+    for var_name, var_type, addr_offset, comment in \
+        zip(hmi_internal.names, hmi_internal.types(), hmi_internal.addr_offsets, hmi_internal.comments):
+
+        if var_type not in ("BIT", "WORD"):
             raise RuntimeError("Invalid type")
 
-        write_rec_hmi_tag_table(hmi_tag_table, var_name, hmi_data['type'], addr, hmi_data['comment'])
-        hmi_curr_addr += int(hmi_data['addr_offset'])
+        yield HMI_TAG_TABLE, (var_name, hmi_curr_addr, var_type == "BIT", var_type, None, comment)
+        hmi_curr_addr += encode_addr(addr_offset)
+
 
-    # write global_var_table into global_variable_table.csv
-    write_glob_var_table_to_csv(global_var_table_name, global_var_table)
+def build_tables(table_rows) -> tuple:
+    global_var_table = RecordTable()
+    hmi_tag_table = RecordTable()
 
-    # write hmi_tag_table into hmi_tag_table.csv
-    write_hmi_tag_table_to_csv(hmi_tag_table_name, hmi_tag_table)
+    for table, row in table_rows:
+        if table == GLOB_VAR_TABLE:
+            global_var_table.append(*row)
+        else:
+            hmi_tag_table.append(*row)
+
+    return global_var_table, hmi_tag_table
+
+
+def stream_tables_to_csv(table_rows, glob_var_filename: str, hmi_tag_filename: str, plc_name: str) -> None:
+    curr_dir = os.path.dirname(os.path.abspath(__file__))
+
+    # both files only replace the old ones once every row has been written
+    with atomic_output(os.path.join(curr_dir, glob_var_filename), mode='w', newline='') as glob_var_file, \
+         atomic_output(os.path.join(curr_dir, hmi_tag_filename), mode='w', newline='') as hmi_tag_file:
+        glob_var_writer = csv.writer(glob_var_file, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        hmi_tag_writer = csv.writer(hmi_tag_file, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
+        glob_var_writer.writerow(GLOB_VAR_HEADER)
+        hmi_tag_writer.writerow(HMI_TAG_HEADER)
+
+        # only names are kept to detect duplicates, a duplicate cannot overwrite a row already written
+        glob_var_names = set()
+        hmi_tag_names = set()
+
+        for table, row in table_rows:
+            if table == GLOB_VAR_TABLE:
+                check_duplicate_name(glob_var_names, row[0], glob_var_filename)
+                glob_var_writer.writerow(glob_var_csv_row(row))
+            else:
+                check_duplicate_name(hmi_tag_names, row[0], hmi_tag_filename)
+                hmi_tag_writer.writerow(hmi_tag_csv_row(row, plc_name))
+
+    print("completed: {}".format(glob_var_filename))
+    print("completed: {}".format(hmi_tag_filename))
+
+
+def check_duplicate_name(names: set, name: str, filename: str) -> None:
+    if name in names:
+        raise RuntimeError("Duplicate name {} in {}".format(name, filename))
+    names.add(name)
+
+
+def read_template_cached(filename: str, cache_dir: str, max_size: int, reader: str = "xml") -> dict:
+    with open(filename, mode='rb') as file:
+        data = file.read()
+
+    key = template_cache.cache_key(data, reader)
+    parsed = template_cache.load_cached(cache_dir, key)
+    if parsed is None:
+        parsed = parse_tables(load_template(io.BytesIO(data), reader))
+        template_cache.store_cached(cache_dir, key, parsed, max_size)
+
+    return parsed
+
+
+def parse_tables(tables: dict, sheets=TEMPLATE_SHEETS) -> dict:
+    parsers = {
+        'constants': ("Constants", read_var_table),
+        'shelfs': ("Shelf", read_var_table),
+        'sensors': ("Sensor List", read_sensor_list_table),
+        'sensor_data': ("Sensor Data", lambda s_table: read_var_table(s_table)[1]),
+        'pumps': ("Pump", read_var_table),
+        'io_data': ("IO Mapping", read_io_mapping_table),
+        'hmi_internal': ("HMI Internal", read_hmi_internal_table),
+    }
+    return {key: read_table(tables[sheet]) for key, (sheet, read_table) in parsers.items() if sheet in sheets}
+
+
+def load_template(filename, reader: str = "xml", sheets=TEMPLATE_SHEETS) -> dict:
+    # open the workbook once and stream every sheet,
+    # cached formula results are used in place of the formulas
+    if reader == "xml":
+        return xlsx_reader.read_sheets(filename, sheets)
+
+    # openpyxl is only imported when asked for, it is slow to import
+    import openpyxl
+    workbook = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+    try:
+        return {name: read_sheet_columns(workbook[name]) for name in sheets}
+    finally:
+        workbook.close()
+
+
+def read_sheet_columns(sheet) -> dict:
+    # dimensions stored in the file are not always reliable
+    sheet.reset_dimensions()
+    return xlsx_reader.rows_to_columns(sheet.iter_rows(values_only=True))
+
+
+def resolve_var_section(var_table, base_addr: int):
+    # yields (name, addr, type, init_value, hmi_tag, comment) for each variable of a section
+    addrs = allocate_addrs(base_addr, var_table)
+    for var_name, addr, var_type, init_value, hmi_tag, comment in zip(
+            var_table.names, addrs, var_table.types(), var_table.init_values, var_table.hmi_tags, var_table.comments):
+        yield var_name, addr, var_type, init_value, hmi_tag, comment
+
+
+def allocate_addrs(base_addr: int, var_table) -> list:
+    # start address of each variable is the base plus the sum of all previous offsets,
+    # returns the encoded addresses
+    return [encode_addr(base_addr + x) for x in itertools.accumulate(var_table.addr_offsets, initial=0)][:-1]
 
-def read_var_table(s_table: dict) -> dict:
-    s_dict = {}
-    if s_table['base_addr'].tolist()[0] != "-":
-        s_base_addr = int(s_table['base_addr'].tolist()[0])
+
+def read_var_table(s_table: dict) -> tuple:
+    s_vars = VarTable()
+    if s_table['base_addr'][0] != "-":
+        s_base_addr = int(s_table['base_addr'][0])
     else:
         s_base_addr = None
-    s_names = s_table['variable_name'].tolist()
-    s_addr_offsets = s_table['addr_offset'].tolist()
-    s_types = s_table['type'].tolist()
-    s_init_values = s_table['init_value'].tolist()
-    s_hmi_tags = s_table['hmi_tag'].tolist()
-    s_comments = s_table['comment'].tolist()
+    s_names = s_table['variable_name']
+    s_addr_offsets = s_table['addr_offset']
+    s_types = s_table['type']
+    s_init_values = s_table['init_value']
+    s_hmi_tags = s_table['hmi_tag']
+    s_comments = s_table['comment']
 
     # inject name, addr_offset, type, init_value
     for s_name, s_addr_offset, s_type, s_init_value, s_hmi_tag, s_comment \
         in zip (s_names, s_addr_offsets, s_types, s_init_values, s_hmi_tags, s_comments):
 
-        s_dict[s_name] = {
-            'addr_offset': s_addr_offset,
-            'type': s_type,
-            'init_value': s_init_value,
-            'hmi_tag': True if not pd.isna(s_hmi_tag) else False,
-            'comment' : s_comment
-            }
+        s_vars.append(s_name, s_addr_offset, s_type, s_init_value, not is_blank(s_hmi_tag), s_comment)
 
-    return s_base_addr, s_dict
+    return s_base_addr, s_vars
 
-def read_sensor_list_table(sl_table: dict) -> dict:
+def read_sensor_list_table(sl_table: dict) -> tuple:
     sl_dict = {}
-    sl_base_addr = int(sl_table['base_addr'].tolist()[0])
-    shelf_sensors = [x for x in sl_table['shelf_sensor'].tolist() if not pd.isna(x)]
-    other_sensors = [x for x in sl_table['general_sensor'].tolist() if not pd.isna(x)]
+    sl_base_addr = int(sl_table['base_addr'][0])
+    shelf_sensors = [x for x in sl_table['shelf_sensor'] if not is_blank(x)]
+    other_sensors = [x for x in sl_table['general_sensor'] if not is_blank(x)]
 
     sl_dict['shelf_sensors'] = shelf_sensors
     sl_dict['other_sensors'] = other_sensors
@@ -327,135 +754,127 @@ def read_sensor_list_table(sl_table: dict) -> dict:
     return sl_base_addr, sl_dict
 
 
-def read_io_mapping_table(io_table: dict) -> dict:
-    io_dict = {}
-    var_names = io_table['variable_name'].tolist()
-    var_addrs = io_table['addr'].tolist()
-    var_types = io_table['type'].tolist()
-    var_init_values = io_table['init_value'].tolist()
-    var_hmi_tags = io_table['hmi_tag'].tolist()
-    var_comments = io_table['comment'].tolist()
+def read_io_mapping_table(io_table: dict):
+    io_records = IoTable()
+    var_names = io_table['variable_name']
+    var_addrs = io_table['addr']
+    var_types = io_table['type']
+    var_init_values = io_table['init_value']
+    var_hmi_tags = io_table['hmi_tag']
+    var_comments = io_table['comment']
 
-    # inject name, addr_offset, type, init_value
+    # inject name, addr, type, init_value
     for io_name, io_addr, io_type, io_init_value, io_hmi_tag, io_comment \
         in zip (var_names, var_addrs, var_types, var_init_values, var_hmi_tags, var_comments):
 
-        io_dict[io_name] = {
-            'addr': io_addr,
-            'type': io_type,
-            'init_value': io_init_value,
-            'hmi_tag': True if not pd.isna(io_hmi_tag) else False,
-            'comment': io_comment
-            }
+        addr, is_bit = parse_addr(io_addr)
+        io_records.append(io_name, addr, is_bit, io_type, io_init_value, io_comment, not is_blank(io_hmi_tag))
 
-    return io_dict
+    return io_records
 
 
-def read_hmi_internal_table(h_table: dict) -> dict:
-    h_dict = {}
-    h_base_addr = int(h_table['base_addr'].tolist()[0])
-    h_names = h_table['var_name'].tolist()
-    h_addr_offsets = h_table['addr_offset'].tolist()
-    h_types = h_table['var_type'].tolist()
-    h_comments = h_table['comment'].tolist()
+def read_hmi_internal_table(h_table: dict) -> tuple:
+    h_vars = VarTable()
+    h_base_addr = int(h_table['base_addr'][0])
+    h_names = h_table['var_name']
+    h_addr_offsets = h_table['addr_offset']
+    h_types = h_table['var_type']
+    h_comments = h_table['comment']
 
     # inject name, addr_offset, type
     for h_name, h_addr_offset, h_type, h_comment in zip (h_names, h_addr_offsets, h_types, h_comments):
-        h_dict[h_name] = {
-            'addr_offset': h_addr_offset,
-            'type': h_type,
-            'comment': h_comment
-        }
+        h_vars.append(h_name, h_addr_offset, h_type, None, True, h_comment)
 
-    return h_base_addr, h_dict
+    return h_base_addr, h_vars
 
 
-def write_rec_glob_var_table(
-    global_var_table: dict, var_name: str, var_addr: str, \
-    var_type: str, var_init_value: str, var_comment: str) -> None:
-
-    global_var_table[var_name] = {
-        "addr": var_addr,
-        "type": var_type,
-        "init_value": var_init_value,
-        "comment": var_comment
-    }
-
-    return
+def glob_var_row(var_rec: tuple) -> tuple:
+    var_name, addr, var_type, init_value, _, comment = var_rec
+    return var_name, addr, "BOOL" in var_type, var_type, init_value, comment
 
 
 def write_glob_var_table_to_csv(filename, global_var_table):
-    header = ["Class", "Identifiers", "Address", "Type", "Initial Value", "Comment"]
     curr_dir = os.path.dirname(os.path.abspath(__file__))
+    write_csv_atomic(os.path.join(curr_dir, filename), GLOB_VAR_HEADER,
+                     (glob_var_csv_row(row) for row in global_var_table.rows()))
 
-    with open(os.path.join(curr_dir, filename), mode='w', newline='') as file:
-        writer = csv.writer(file, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        writer.writerow(header)
+    print("completed: global_variable_table.csv")
 
-        for var_name in global_var_table:
-            var_data = global_var_table[var_name]
-            if isinstance(var_data['comment'], str):
-                writer.writerow(['VAR', var_name, var_data['addr'], var_data['type'], var_data['init_value'], var_data['comment']])
-            else:
-                writer.writerow(['VAR', var_name, var_data['addr'], var_data['type'], var_data['init_value']])
 
-    print("completed: global_variable_table.csv")
+def hmi_tag_rows(var_rec: tuple) -> list:
+    var_name, addr, var_type, _, hmi_tag, comment = var_rec
 
+    # filter those that should go into hmi_tag
+    if not hmi_tag:
+        return []
 
-def write_rec_hmi_tag_table(
-    table: dict, var_name: str, var_type: str, var_addr: str, var_comment: str) -> None:
+    descriptor = compile_type(var_type)
+    hmi_type = descriptor.hmi_type
+    if hmi_type is None:
+        raise RuntimeError("Invalid type")
 
-    table[var_name] = {
-        "type": var_type,
-        "addr": var_addr,
-        "desc": var_comment
-    }
+    # non-array variable
+    if descriptor.elements is None:
+        return [(var_name, addr, descriptor.is_bit, hmi_type, None, comment)]
 
-    return
+    # every element of an array at once, names and address offsets are precomputed
+    is_bit = descriptor.is_bit
+    return [(var_name + suffix, addr + offset, is_bit, hmi_type, None, comment)
+            for suffix, offset in descriptor.elements]
 
 
-def write_hmi_tag_table_to_csv(filename, hmi_tag_table):
-    header = ['Define Name', 'Type', 'Address', 'Description']
+def write_hmi_tag_table_to_csv(filename, hmi_tag_table, plc_name):
     curr_dir = os.path.dirname(os.path.abspath(__file__))
+    write_csv_atomic(os.path.join(curr_dir, filename), HMI_TAG_HEADER,
+                     (hmi_tag_csv_row(row, plc_name) for row in hmi_tag_table.rows()))
 
-    with open(os.path.join(curr_dir, filename), mode='w', newline='') as file:
-        writer = csv.writer(file, delimiter=',', quotechar='"', quoting=csv.QUOTE_MINIMAL)
-        writer.writerow(header)
+    print("completed: hmi_tag_table.csv")
 
-        for var_name in hmi_tag_table:
-            var_data = hmi_tag_table[var_name]
-            if isinstance(var_data['desc'], str):
-                writer.writerow([var_name, var_data['type'], var_data['addr'], var_data['desc']])
-            else:
-                writer.writerow([var_name, var_data['type'], var_data['addr']])
 
-    print("completed: hmi_tag_table.csv")
+def hmi_tag_csv_link_rows(hmi_tag_table, plc_names: list) -> list:
+    # csv rows of hmi_tag_table for each plc link, with several links the rows are
+    # formatted once without a prefix and every link only adds its own
+    if len(plc_names) == 1:
+        return [(hmi_tag_csv_row(row, plc_names[0]) for row in hmi_tag_table.rows())]
 
+    rows = [hmi_tag_csv_row(row, "") for row in hmi_tag_table.rows()]
+    linked = [addr >> AREA_SHIFT != HMI_AREA for addr in hmi_tag_table.addrs]
+    return [link_rows(rows, linked, plc_name) for plc_name in plc_names]
 
-def calc_addr_offset_hmi_tag(is_array: bool, var_type: str, offset: str) -> Union[int, float]:
-    if var_type == "BOOL":
-        return (0.1) if is_array else float(offset)
-    elif var_type == "WORD":
-        return (1) if is_array else int(offset)
-    else:
-        raise RuntimeError("Invalid type")
 
-def translate_var_type_hmi_tag(var_type: str) -> str:
-    if var_type == "BOOL":
-        return "BIT"
-    elif var_type == "WORD":
-        return "WORD"
-    else:
-        raise RuntimeError("Invalid type")
+def link_rows(rows: list, linked: list, plc_name: str):
+    # rows of one link, a function of its own so every link keeps its own plc_name
+    return ([row[0], row[1], plc_name + row[2], *row[3:]] if is_linked else row
+            for row, is_linked in zip(rows, linked))
+
+
+def parse_link(text: str) -> tuple:
+    # "{EtherLink2}1@=hmi_tag_line2.csv" -> ("{EtherLink2}1@", "hmi_tag_line2.csv")
+    plc_name, sep, filename = text.partition("=")
+    if not sep or not filename:
+        raise argparse.ArgumentTypeError("expected PREFIX=PATH, got {}".format(text))
+    return plc_name, filename
 
 
-def get_array_size(data: str) -> int:
-    tmp = data.split(' ')
-    return int(tmp[1].replace('[', '').replace(']',''))
+def glob_var_csv_row(row: tuple) -> list:
+    var_name, addr, is_bit, var_type, init_value, comment = row
+    if isinstance(comment, str):
+        return ['VAR', var_name, format_addr(addr, is_bit), var_type, init_value, comment]
+    return ['VAR', var_name, format_addr(addr, is_bit), var_type, init_value]
 
 
-def get_array_type(data: str) -> int:
-    return data.split(' ')[3]
+def hmi_tag_csv_row(row: tuple, plc_name: str) -> list:
+    var_name, addr, is_bit, var_type, _, comment = row
+
+    # hmi internal registers are local to the hmi, everything else is read through the plc link
+    if addr >> AREA_SHIFT == HMI_AREA:
+        addr = format_addr(addr, is_bit)
+    else:
+        addr = plc_name + format_addr(addr, is_bit)
+
+    if isinstance(comment, str):
+        return [var_name, var_type, addr, comment]
+    return [var_name, var_type, addr]
 
 
 if __name__ == "__main__":
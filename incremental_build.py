@@ -0,0 +1,115 @@
+"""
+    Incremental Build:
+
+    Function:
+    - fingerprints each sheet of an xlsx template from its raw xml part,
+      a changed sheet is found without parsing the workbook
+    - keeps a manifest beside the generated csv files with the sheet
+      fingerprints, the length of every section in both files and a digest
+      of the files and of the generator source that wrote them
+    - splits the previous csv files back into their sections, so the
+      sections of unchanged sheets can be reused as they are
+"""
+
+import hashlib
+import json
+import os
+import re
+import zipfile
+import xlsx_reader
+
+
+MANIFEST_VERSION = 1
+
+# cells that hold an index into sharedStrings.xml instead of their text
+SHARED_STRING_CELL = re.compile(rb"""\bt=["']s["']""")
+
+
+def sheet_fingerprints(filename, sheet_names) -> dict:
+    with zipfile.ZipFile(filename) as archive:
+        sheet_paths = xlsx_reader.read_sheet_paths(archive)
+
+        shared_strings_digest = b""
+        if "xl/sharedStrings.xml" in archive.namelist():
+            shared_strings_digest = hashlib.sha256(archive.read("xl/sharedStrings.xml")).digest()
+
+        fingerprints = {}
+        for name in sheet_names:
+            if name not in sheet_paths:
+                raise KeyError("Worksheet {} does not exist.".format(name))
+            data = archive.read(sheet_paths[name])
+            digest = hashlib.sha256(data)
+
+            # the text of a shared string cell is not in the sheet itself
+            if SHARED_STRING_CELL.search(data):
+                digest.update(shared_strings_digest)
+            fingerprints[name] = digest.hexdigest()
+
+    return fingerprints
+
+
+def file_digest(filename: str) -> str:
+    digest = hashlib.sha256()
+    with open(filename, mode='rb') as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_manifest(filename: str, generator: str, plc_name: str, outputs: list) -> dict:
+    # returns None unless the manifest describes exactly the output files on disk
+    try:
+        with open(filename) as file:
+            manifest = json.load(file)
+        output_digests = [file_digest(output) for output in outputs]
+    except (OSError, ValueError):
+        return None
+
+    if manifest.get('version') != MANIFEST_VERSION or manifest.get('generator') != generator \
+            or manifest.get('plc_name') != plc_name or manifest.get('outputs') != output_digests:
+        return None
+    return manifest
+
+
+def store_manifest(filename: str, manifest: dict) -> None:
+    manifest = dict(manifest, version=MANIFEST_VERSION)
+    tmp_filename = "{}.{}.tmp".format(filename, os.getpid())
+    with open(tmp_filename, mode='w') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(tmp_filename, filename)
+
+
+def remove_manifest(filename: str) -> None:
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+
+
+def split_sections(outputs: list, manifest: dict) -> dict:
+    # {section: text of the section in each output file}, None when the lengths do not add up
+    texts = []
+    for output, header_length, section_lengths in \
+            zip(outputs, manifest['headers'], zip(*(lengths for _, *lengths in manifest['sections']))):
+        with open(output, newline='') as file:
+            text = file.read()
+        if header_length + sum(section_lengths) != len(text):
+            return None
+
+        section_texts = []
+        start = header_length
+        for length in section_lengths:
+            section_texts.append(text[start:start + length])
+            start += length
+        texts.append(section_texts)
+
+    return {section: section_texts for (section, *_), section_texts in zip(manifest['sections'], zip(*texts))}
+
+
+def source_digest(filenames: list) -> str:
+    # generated rows depend on the code as much as on the template
+    digest = hashlib.sha256()
+    for filename in filenames:
+        with open(filename, mode='rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
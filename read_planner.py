@@ -0,0 +1,300 @@
+"""
+    Read Planner:
+
+    Function:
+    - groups the plc tags of hmi_tag_table into contiguous word reads, the
+      hmi then polls a few blocks instead of every tag on its own
+    - a block never spans more than --max-words words and never bridges a
+      gap of more than --max-gap unused words, within those limits the
+      fewest blocks are used (one greedy sweep over the sorted words)
+    - hmi internal tags ($) are local to the hmi and are not planned
+    - writes the plan as json and reports the round trips saved
+    - --simulate polls every tag both ways from a local stand-in server that
+      counts requests, and checks both give the same values
+
+    How to use:
+    - in terminal, input "python read_planner.py [template.xlsx] [-o read_plan.json] [--max-words 100] [--max-gap 8]"
+    - add "--simulate [--latency 2] [--image register_image.bin]" to test the plan against the stand-in server
+"""
+
+from array import array
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+import address_codec as codec
+import global_variable_generator as gvg
+
+
+DEFAULT_FILENAME = "read_plan.json"
+PLAN_VERSION = 1
+
+# a modbus read holding registers request is limited to 125 words, leave some room
+DEFAULT_MAX_WORDS = 100
+DEFAULT_MAX_GAP = 8
+
+# stand-in protocol, modbus-like but with 32 bit word addresses and the register area in the request:
+# request is transaction, function, area, first word, word count; response is transaction, function,
+# word count followed by the words, the function comes back with ERROR_FLAG set on a bad request
+REQUEST = struct.Struct(">HBBIH")
+RESPONSE = struct.Struct(">HBH")
+READ_WORDS = 3
+ERROR_FLAG = 0x80
+
+
+def main(argv=None):
+
+    # parameter
+    parser = argparse.ArgumentParser(description="Group the HMI tags of a template into contiguous block reads")
+    parser.add_argument("input_name", nargs="?", default="global_variable_template.xlsx")
+    parser.add_argument("-o", "--output", default=DEFAULT_FILENAME, help="plan file (default: %(default)s)")
+    parser.add_argument("--max-words", type=int, default=DEFAULT_MAX_WORDS,
+                        help="most words read by one block (default: %(default)s)")
+    parser.add_argument("--max-gap", type=int, default=DEFAULT_MAX_GAP,
+                        help="most unused words read to join two tags into one block (default: %(default)s)")
+    parser.add_argument("--simulate", action="store_true",
+                        help="poll every tag one by one and by the plan from a local stand-in server")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="round trip time the stand-in server adds to every request in ms (default: %(default)s)")
+    parser.add_argument("--image", help="register image the stand-in server answers D registers from")
+    args = parser.parse_args(argv)
+    if args.max_words < 1 or args.max_words > 0xFFFF:
+        parser.error("--max-words must be between 1 and 65535")
+    if args.max_gap < 0:
+        parser.error("--max-gap cannot be negative")
+
+    curr_dir = os.path.dirname(os.path.abspath(__file__))
+    tables = gvg.generate(os.path.join(curr_dir, args.input_name))
+    tags = plc_tags(tables.hmi_tag_table)
+    blocks = plan_reads(tags, args.max_words, args.max_gap)
+
+    with gvg.atomic_output(os.path.join(curr_dir, args.output), mode='w') as file:
+        json.dump(plan_json(blocks, args.max_words, args.max_gap), file)
+    print("completed: {}".format(args.output))
+    print_report(tags, blocks)
+
+    if args.simulate:
+        image = None
+        if args.image:
+            # imported here, the planner itself does not need it
+            import register_image
+            image = register_image.RegisterImage(os.path.join(curr_dir, args.image))
+        try:
+            simulate(tags, blocks, image, args.latency / 1000)
+        finally:
+            if image is not None:
+                image.close()
+
+
+def plc_tags(hmi_tag_table) -> list:
+    # (name, encoded addr, is_bit) of every tag read through the plc link
+    return [(name, addr, bool(is_bit)) for name, addr, is_bit in
+            zip(hmi_tag_table.names, hmi_tag_table.addrs, hmi_tag_table.is_bits)
+            if addr >> codec.AREA_SHIFT != codec.HMI_AREA]
+
+
+class ReadBlock:
+    # one read of count words from start, tags are (name, word offset in the block, bit or None)
+    __slots__ = ('area', 'start', 'count', 'tags')
+
+    def __init__(self, area: int, start: int):
+        self.area = area
+        self.start = start
+        self.count = 1
+        self.tags = []
+
+
+def plan_reads(tags: list, max_words: int = DEFAULT_MAX_WORDS, max_gap: int = DEFAULT_MAX_GAP) -> list:
+    # a block is extended by the next word until that would break a limit, on sorted words
+    # this greedy sweep gives the fewest blocks, blocks come sorted by area and start
+    area_words = {}
+    for name, addr, is_bit in tags:
+        word = (addr >> codec.BIT_INDEX_BITS) & codec.WORD_MASK
+        bit = addr & codec.BIT_INDEX_MASK if is_bit else None
+        area_words.setdefault(addr >> codec.AREA_SHIFT, []).append((word, bit, name))
+
+    blocks = []
+    for area in sorted(area_words):
+        block = None
+        for word, bit, name in sorted(area_words[area], key=lambda tag: tag[0]):
+            if block is None or word - block.start >= max_words or word - (block.start + block.count) > max_gap:
+                block = ReadBlock(area, word)
+                blocks.append(block)
+            block.count = max(block.count, word - block.start + 1)
+            block.tags.append((name, word - block.start, bit))
+
+    return blocks
+
+
+def plan_json(blocks: list, max_words: int, max_gap: int) -> dict:
+    return {
+        'version': PLAN_VERSION,
+        'max_words': max_words,
+        'max_gap': max_gap,
+        'blocks': [{'area': codec.ADDR_AREAS[block.area], 'start': block.start, 'count': block.count,
+                    'tags': block.tags} for block in blocks],
+    }
+
+
+def print_report(tags: list, blocks: list) -> None:
+    words = sum(block.count for block in blocks)
+    used = sum(len({offset for _, offset, _ in block.tags}) for block in blocks)
+    saved = 1 - len(blocks) / len(tags) if tags else 0
+    print("{} tags in {} blocks: {} round trips instead of {} ({:.1%} fewer), {} words read, {} of them unused"
+          .format(len(tags), len(blocks), len(blocks), len(tags), saved, words, words - used))
+
+
+def simulate(tags: list, blocks: list, image=None, latency: float = 0.0) -> None:
+    # polls every tag once by itself and once by the plan, both have to give the same values
+    with StandInServer(image, latency) as server:
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with StandInClient(server.server_address) as client:
+                results = []
+                for name, poll, reads in (("one by one", poll_tags, tags), ("by plan", poll_blocks, blocks)):
+                    server.reset_counts()
+                    start = time.perf_counter()
+                    values = poll(client, reads)
+                    elapsed = time.perf_counter() - start
+                    print("{:<10}  {:6} requests  {:7} words  {:9.1f} ms".format(
+                        name, server.requests, server.words_read, elapsed * 1000))
+                    results.append(values)
+        finally:
+            server.shutdown()
+
+    if results[0] != results[1]:
+        raise RuntimeError("Tag values polled by the plan differ from the tags polled one by one")
+    print("same values for all {} tags".format(len(results[0])))
+
+
+def poll_tags(client: "StandInClient", tags: list) -> dict:
+    values = {}
+    for name, addr, is_bit in tags:
+        word = (addr >> codec.BIT_INDEX_BITS) & codec.WORD_MASK
+        value = client.read_words(addr >> codec.AREA_SHIFT, word, 1)[0]
+        values[name] = value >> (addr & codec.BIT_INDEX_MASK) & 1 if is_bit else value
+    return values
+
+
+def poll_blocks(client: "StandInClient", blocks: list) -> dict:
+    values = {}
+    for block in blocks:
+        words = client.read_words(block.area, block.start, block.count)
+        for name, offset, bit in block.tags:
+            values[name] = words[offset] if bit is None else words[offset] >> bit & 1
+    return values
+
+
+class StandInServer(socketserver.ThreadingTCPServer):
+    # answers word reads on localhost and counts them, D registers come from a register image
+    # when one is given, every other word holds a value derived from its area and address
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, image=None, latency: float = 0.0, address: tuple = ("127.0.0.1", 0)):
+        super().__init__(address, StandInHandler)
+        self.image = image
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.words_read = 0
+
+    def reset_counts(self) -> None:
+        with self.lock:
+            self.requests = 0
+            self.words_read = 0
+
+    def read_words(self, area: int, start: int, count: int) -> array:
+        with self.lock:
+            self.requests += 1
+            self.words_read += count
+        image = self.image
+        if image is not None and area == codec.ADDR_AREAS.index(image.area):
+            words = array('H', bytes(2 * count))
+            first = max(start, image.base_word)
+            last = min(start + count, image.base_word + len(image))
+            if first < last:
+                words[first - start:last - start] = array('H', image.words[first - image.base_word:
+                                                                           last - image.base_word])
+            return words
+        return array('H', (stand_in_value(area, word) for word in range(start, start + count)))
+
+
+def stand_in_value(area: int, word: int) -> int:
+    return (word * 40503 + area * 2654435761) >> 3 & 0xFFFF
+
+
+class StandInHandler(socketserver.BaseRequestHandler):
+
+    def handle(self) -> None:
+        while True:
+            request = receive_exact(self.request, REQUEST.size)
+            if request is None:
+                return
+            transaction, function, area, start, count = REQUEST.unpack(request)
+            if function != READ_WORDS or area >= len(codec.ADDR_AREAS) or count == 0:
+                self.request.sendall(RESPONSE.pack(transaction, function | ERROR_FLAG, 0))
+                continue
+
+            words = self.server.read_words(area, start, count)
+            if self.server.latency:
+                time.sleep(self.server.latency)
+            # words go over the wire big-endian like modbus registers
+            if sys.byteorder == "little":
+                words.byteswap()
+            self.request.sendall(RESPONSE.pack(transaction, function, count) + words.tobytes())
+
+
+class StandInClient:
+    # one connection to a stand-in server, one request at a time
+    __slots__ = ('sock', 'transaction')
+
+    def __init__(self, address: tuple):
+        self.sock = socket.create_connection(address)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.transaction = 0
+
+    def __enter__(self) -> "StandInClient":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.sock.close()
+
+    def read_words(self, area: int, start: int, count: int) -> array:
+        self.transaction = (self.transaction + 1) & 0xFFFF
+        self.sock.sendall(REQUEST.pack(self.transaction, READ_WORDS, area, start, count))
+
+        response = receive_exact(self.sock, RESPONSE.size)
+        if response is None:
+            raise RuntimeError("Stand-in server closed the connection")
+        transaction, function, n_words = RESPONSE.unpack(response)
+        if function != READ_WORDS or transaction != self.transaction:
+            raise RuntimeError("Read of {} words from {}{} failed".format(count, codec.ADDR_AREAS[area], start))
+
+        words = array('H', receive_exact(self.sock, 2 * n_words))
+        if sys.byteorder == "little":
+            words.byteswap()
+        return words
+
+
+def receive_exact(sock, size: int) -> bytes:
+    # None when the other side closed the connection before sending anything
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            if data:
+                raise RuntimeError("Connection closed in the middle of a message")
+            return None
+        data += chunk
+    return bytes(data)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+    Register Image:
+
+    Function:
+    - writes the initial value of every D register as a flat binary image,
+      one little-endian uint16 per word from the lowest allocated word up
+      to the highest, BOOL bits packed into their words and every element
+      of an ARRAY laid out, e.g. "[3(0)]" or "[2(TRUE),FALSE]"
+    - 32 and 64 bit types take 2 and 4 words, low word first, REAL and
+      LREAL as IEEE floats
+    - a 16 byte header in front of the words holds the register area, the
+      first word and the number of words
+    - RegisterImage memory-maps an image, its words are read in place
+      without copying or parsing anything
+
+    How to use:
+    - in terminal, input "python register_image.py [template.xlsx] [-o register_image.bin] [--dump D10002 ...]"
+    - or run global_variable_generator.py with --register-image
+    - with RegisterImage("register_image.bin") as image: image.word(10002), image.bit(10002, 1)
+"""
+
+from array import array
+import argparse
+import mmap
+import os
+import struct
+import sys
+import address_codec as codec
+
+
+DEFAULT_FILENAME = "register_image.bin"
+
+# magic, version, register area, first word, number of words
+MAGIC = b"GVRI"
+VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+
+# wider types are split into words low word first, floats as IEEE
+FLOAT_FORMATS = {"REAL": "<f", "LREAL": "<d"}
+TRUE_VALUES = {"TRUE": 1, "FALSE": 0}
+
+
+def main(argv=None):
+
+    # parameter
+    parser = argparse.ArgumentParser(description="Write the initial values of the D registers as a binary image")
+    parser.add_argument("input_name", nargs="?", default="global_variable_template.xlsx")
+    parser.add_argument("-o", "--output", default=DEFAULT_FILENAME,
+                        help="image file (default: %(default)s)")
+    parser.add_argument("--dump", nargs="+", default=[], metavar="ADDR",
+                        help="print the value of each address from the written image, e.g. D10002 or D10002.1")
+    args = parser.parse_args(argv)
+
+    # imported here, the generator imports this module itself
+    import global_variable_generator as gvg
+    curr_dir = os.path.dirname(os.path.abspath(__file__))
+    tables = gvg.generate(os.path.join(curr_dir, args.input_name))
+    output = os.path.join(curr_dir, args.output)
+    with gvg.atomic_output(output, mode='wb') as file:
+        write_image(file, tables.global_var_table.rows())
+
+    with RegisterImage(output) as image:
+        print("completed: {} ({}{} - {}{}, {} words)".format(
+            args.output, image.area, image.base_word, image.area, image.base_word + len(image) - 1, len(image)))
+        for text in args.dump:
+            addr, is_bit = codec.parse_addr(text)
+            word = (addr >> codec.BIT_INDEX_BITS) & codec.WORD_MASK
+            value = image.bit(word, addr & codec.BIT_INDEX_MASK) if is_bit else image.word(word)
+            print("{}: {}".format(text, value))
+
+
+def write_image(file, rows, area: str = "D") -> int:
+    # rows of global_var_table, variables outside the register area are left out, returns the number of words
+    base_word, words = build_words(rows, area)
+    if sys.byteorder != "little":
+        words.byteswap()
+
+    file.write(HEADER.pack(MAGIC, VERSION, codec.ADDR_AREAS.index(area), base_word, len(words)))
+    file.write(words.tobytes())
+    return len(words)
+
+
+def build_words(rows, area: str = "D") -> tuple:
+    # (first word, array('H') of every word up to the last one), words no variable occupies are 0
+    area_index = codec.ADDR_AREAS.index(area)
+    variables = []
+    start = end = None
+    for var_name, addr, _, var_type, init_value, _ in rows:
+        if addr >> codec.AREA_SHIFT != area_index:
+            continue
+        descriptor = codec.compile_type(var_type)
+        if descriptor.stride is None:
+            raise RuntimeError("Invalid type {} of {}".format(var_type, var_name))
+
+        # addresses are in bits within the area, so are the bounds
+        addr -= area_index << codec.AREA_SHIFT
+        var_end = addr + descriptor.count * descriptor.stride
+        start = addr if start is None else min(start, addr)
+        end = var_end if end is None else max(end, var_end)
+        variables.append((var_name, addr, descriptor, init_value))
+
+    if start is None:
+        return 0, array('H')
+
+    base_word = start >> codec.BIT_INDEX_BITS
+    words = array('H', bytes(2 * (((end - 1) >> codec.BIT_INDEX_BITS) - base_word + 1)))
+    base_addr = base_word << codec.BIT_INDEX_BITS
+
+    # initial values repeat a lot (e.g. every shelf), each (type, value) is encoded once
+    encoded = {}
+    for var_name, addr, descriptor, init_value in variables:
+        key = (descriptor, init_value)
+        block = encoded.get(key)
+        if block is None:
+            block = encoded[key] = encode_values(descriptor, init_value, var_name)
+
+        addr -= base_addr
+        if descriptor.stride == 1:
+            # bit offsets that are TRUE
+            for j in block:
+                words[(addr + j) >> codec.BIT_INDEX_BITS] |= 1 << ((addr + j) & codec.BIT_INDEX_MASK)
+        else:
+            # wider types start on a word
+            word = addr >> codec.BIT_INDEX_BITS
+            words[word:word + len(block)] = block
+
+    return base_word, words
+
+
+def encode_values(descriptor, init_value, var_name: str = ""):
+    # the offsets of the TRUE bits of a BOOL variable, otherwise the array('H') of its words
+    values = parse_init_values(init_value, descriptor.count, var_name)
+    if descriptor.stride == 1:
+        return [j for j, value in enumerate(values) if bool_value(value, var_name)]
+
+    block = array('H')
+    for value in values:
+        block.extend(value_words(value, descriptor.base_type, var_name))
+    return block
+
+
+def parse_init_values(init_value, count: int, var_name: str = "") -> list:
+    # the value of each element as text, "[3(0)]" -> ["0", "0", "0"], "[1,2(5)]" -> ["1", "5", "5"],
+    # a blank initial value is 0 and a single value is used for every element
+    if codec.is_blank(init_value) or str(init_value).strip() == "":
+        return ["0"] * count
+
+    text = str(init_value).strip()
+    if not (text.startswith("[") and text.endswith("]")):
+        return [text] * count
+
+    values = []
+    for item in text[1:-1].split(","):
+        item = item.strip()
+        repeat, sep, value = item.partition("(")
+        if sep:
+            if not value.endswith(")") or not repeat.strip().isdigit():
+                raise RuntimeError("Invalid initial value {} of {}".format(init_value, var_name))
+            values += [value[:-1].strip()] * int(repeat)
+        else:
+            values.append(item)
+
+    if len(values) != count:
+        raise RuntimeError("{} initial values given for the {} elements of {}".format(len(values), count, var_name))
+    return values
+
+
+def bool_value(text: str, var_name: str = "") -> int:
+    value = TRUE_VALUES.get(text.upper())
+    if value is None:
+        value = parse_int(text, var_name)
+        if value not in (0, 1):
+            raise RuntimeError("Invalid BOOL value {} of {}".format(text, var_name))
+    return value
+
+
+def value_words(text: str, base_type: str, var_name: str = "") -> tuple:
+    # the words a value of base_type is stored in, low word first
+    bits = codec.TYPE_BITS[base_type]
+    if base_type in FLOAT_FORMATS:
+        try:
+            packed = struct.pack(FLOAT_FORMATS[base_type], float(text))
+        except (ValueError, OverflowError):
+            raise RuntimeError("Invalid {} value {} of {}".format(base_type, text, var_name)) from None
+        return struct.unpack("<{}H".format(bits // 16), packed)
+
+    # signed and unsigned values are both accepted, e.g. WORD -1 is 16#FFFF
+    value = parse_int(text, var_name)
+    if not -(1 << (bits - 1)) <= value < (1 << bits):
+        raise RuntimeError("{} value {} of {} out of range".format(base_type, text, var_name))
+    value &= (1 << bits) - 1
+    return tuple((value >> shift) & 0xFFFF for shift in range(0, bits, 16))
+
+
+def parse_int(text: str, var_name: str = "") -> int:
+    # decimal or IEC literals as ISPSoft writes them, e.g. 16#FF, 2#1010, 8#17
+    text = text.replace("_", "")
+    radix, sep, digits = text.partition("#")
+    try:
+        if sep:
+            return int(digits, int(radix))
+        try:
+            return int(text)
+        except ValueError:
+            # numbers read from the workbook may come as floats, e.g. "2.0"
+            value = float(text)
+            if value != int(value):
+                raise
+            return int(value)
+    except (ValueError, OverflowError):
+        raise RuntimeError("Invalid integer value {} of {}".format(text, var_name)) from None
+
+
+class RegisterImage:
+    # a register image mapped into memory, words are read straight from the page cache
+    __slots__ = ('area', 'base_word', 'words', '_file', '_map')
+
+    def __init__(self, filename: str):
+        self._file = open(filename, mode='rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._file.close()
+            raise
+
+        header = HEADER.unpack_from(self._map) if len(self._map) >= HEADER.size else None
+        if header is None or header[:2] != (MAGIC, VERSION) or HEADER.size + 2 * header[4] != len(self._map):
+            self.close()
+            raise RuntimeError("{} is not a register image of version {}".format(filename, VERSION))
+        _, _, area, base_word, _ = header
+
+        self.area = codec.ADDR_AREAS[area]
+        self.base_word = base_word
+        # uint16 in native order, images are written little-endian
+        self.words = memoryview(self._map)[HEADER.size:].cast('H')
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __enter__(self) -> "RegisterImage":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        # views into the map have to be released before it can be closed,
+        # arrays from as_numpy() must be dropped first
+        if getattr(self, 'words', None) is not None:
+            self.words.release()
+            self.words = None
+        self._map.close()
+        self._file.close()
+
+    def word(self, word: int) -> int:
+        # value of a word register as uint16, words before or past the image raise IndexError
+        i = word - self.base_word
+        if not 0 <= i < len(self.words):
+            raise IndexError("{}{} is not in the image".format(self.area, word))
+        return self.words[i] if sys.byteorder == "little" else self.words[i] >> 8 | (self.words[i] & 0xFF) << 8
+
+    def bit(self, word: int, bit: int) -> bool:
+        return bool(self.word(word) >> bit & 1)
+
+    def as_numpy(self):
+        # read-only numpy view of the words, numpy is only imported when asked for
+        import numpy as np
+        return np.frombuffer(self._map, dtype='<u2', offset=HEADER.size)
+
+
+if __name__ == "__main__":
+    main()
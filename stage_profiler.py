@@ -0,0 +1,114 @@
+"""
+    Stage Profiler:
+
+    Function:
+    - records wall time, peak memory (tracemalloc) and rows produced
+      for each stage of a generation run, stage peaks are measured above
+      the memory already in use when the stage starts
+    - stages can be nested (e.g. sections generated while the tables are
+      built), a stage reports its own time without its nested stages, so the
+      times add up to the total, and its peak includes theirs
+    - optionally runs cProfile over the whole run and keeps the hottest functions
+    - prints the results or returns them as a structured report
+"""
+
+import contextlib
+import cProfile
+import pstats
+import time
+import tracemalloc
+
+
+class StageProfiler:
+
+    def __init__(self, cprofile_path: str = None, top_functions: int = 20):
+        self.stages = []
+        self.cprofile_path = cprofile_path
+        self.top_functions = top_functions
+        self.hot_functions = []
+        self._cprofile = None
+        self._start_time = None
+        # open stages, innermost last: [record, start memory, peak so far, time of nested stages]
+        self._open = []
+
+    def start(self) -> None:
+        tracemalloc.start()
+        if self.cprofile_path:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self._start_time = time.perf_counter()
+
+    def stop(self) -> None:
+        self.total_time = time.perf_counter() - self._start_time
+        self.peak_kb = tracemalloc.get_traced_memory()[1] / 1024
+        tracemalloc.stop()
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_path)
+            self.hot_functions = hottest_functions(pstats.Stats(self._cprofile), self.top_functions)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        # callers may set record['rows'] to the number of rows the stage produced
+        record = {'name': name, 'time_s': 0.0, 'peak_kb': 0.0, 'rows': None, 'depth': len(self._open)}
+        self.stages.append(record)
+
+        # the enclosing stage keeps its peak so far, reset_peak() would lose it
+        if self._open:
+            parent = self._open[-1]
+            parent[2] = max(parent[2], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        entry = [record, tracemalloc.get_traced_memory()[0], 0, 0.0]
+        self._open.append(entry)
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = time.perf_counter() - start
+            self._open.pop()
+            _, start_memory, peak, nested_time = entry
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            record['time_s'] = elapsed - nested_time
+            record['peak_kb'] = (peak - start_memory) / 1024
+            if self._open:
+                parent = self._open[-1]
+                parent[2] = max(parent[2], peak)
+                parent[3] += elapsed
+
+    def report(self) -> dict:
+        return {
+            'total_time_s': self.total_time,
+            'peak_kb': self.peak_kb,
+            'stages': self.stages,
+            'hot_functions': self.hot_functions,
+        }
+
+    def print_report(self) -> None:
+        print("{:<36} {:>10} {:>12} {:>10}".format("stage", "time (ms)", "peak (KB)", "rows"))
+        for record in self.stages:
+            # nested stages are indented below their enclosing stage
+            print("{:<36} {:>10.2f} {:>12.1f} {:>10}".format(
+                "  " * record['depth'] + record['name'], record['time_s'] * 1000, record['peak_kb'],
+                "" if record['rows'] is None else record['rows']))
+        print("{:<36} {:>10.2f} {:>12.1f}".format("total", self.total_time * 1000, self.peak_kb))
+
+        if self.hot_functions:
+            print("\nhottest functions (by own time), full profile in {}".format(self.cprofile_path))
+            for func in self.hot_functions:
+                print("  {:>10.2f} ms {:>10.2f} ms cum {:>9} calls  {}".format(
+                    func['tottime_s'] * 1000, func['cumtime_s'] * 1000, func['ncalls'], func['function']))
+
+
+def hottest_functions(stats: pstats.Stats, count: int) -> list:
+    functions = []
+    for (filename, line, func_name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        functions.append({
+            'function': "{}:{}({})".format(filename, line, func_name),
+            'ncalls': ncalls,
+            'tottime_s': tottime,
+            'cumtime_s': cumtime,
+        })
+
+    functions.sort(key=lambda x: x['tottime_s'], reverse=True)
+    return functions[:count]
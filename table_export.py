@@ -0,0 +1,65 @@
+"""
+    Table Export:
+
+    Function:
+    - writes generated tables column by column for tools that load them on
+      every build, as a compressed numpy archive (.npz) or a parquet file
+    - columns are given as {column name: values}, array('q') columns are
+      written as int64, bytearray columns as bool and anything else as text
+    - numpy and pyarrow are only imported when their format is written,
+      pyarrow is optional and only needed for parquet
+
+    How to use:
+    - numpy.load("global_variable_table.npz")["name"]
+    - pyarrow.parquet.read_table("global_variable_table.parquet")
+"""
+
+from array import array
+import importlib.util
+
+
+FORMATS = {"npz": ".npz", "parquet": ".parquet"}
+
+
+def check_format(fmt: str) -> None:
+    # fails before anything is written when the library of a format is missing
+    if fmt == "parquet" and importlib.util.find_spec("pyarrow") is None:
+        raise RuntimeError("parquet output needs pyarrow, install it or use npz")
+
+
+def write_columns(file, columns: dict, fmt: str) -> None:
+    if fmt == "npz":
+        write_npz(file, columns)
+    elif fmt == "parquet":
+        write_parquet(file, columns)
+    else:
+        raise RuntimeError("Unknown format {}".format(fmt))
+
+
+def write_npz(file, columns: dict) -> None:
+    import numpy as np
+    np.savez_compressed(file, **{name: npz_array(values) for name, values in columns.items()})
+
+
+def npz_array(values):
+    import numpy as np
+    if isinstance(values, array):
+        return np.array(values, dtype=np.int64)
+    if isinstance(values, (bytes, bytearray)):
+        return np.frombuffer(values, dtype=np.uint8).astype(bool)
+    return np.array(["" if x is None else str(x) for x in values], dtype=str)
+
+
+def write_parquet(file, columns: dict) -> None:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    pq.write_table(pa.table({name: arrow_array(values) for name, values in columns.items()}), file)
+
+
+def arrow_array(values):
+    import pyarrow as pa
+    if isinstance(values, array):
+        return pa.array(values.tolist(), type=pa.int64())
+    if isinstance(values, (bytes, bytearray)):
+        return pa.array([bool(x) for x in values], type=pa.bool_())
+    return pa.array([None if x is None else str(x) for x in values], type=pa.string())
@@ -0,0 +1,270 @@
+"""
+    Tag Index:
+
+    Function:
+    - writes a binary lookup index beside a generated table, e.g.
+      global_variable_table.idx beside global_variable_table.csv
+    - name -> row through an open addressing hash table, O(1)
+    - address -> rows through the address ranges sorted once, O(log n),
+      any word or bit inside an array finds the array
+    - TagIndex memory-maps an index and answers lookups in place, only the
+      rows a lookup finds are decoded, the table itself is never loaded
+    - addresses of hmi tags are stored without the plc link prefix
+
+    How to use:
+    - run global_variable_generator.py with --index
+    - in terminal, input "python tag_index.py global_variable_table.idx [--name s0_mode ...] [--addr D10012 ...]"
+    - with TagIndex("global_variable_table.idx") as index: index.find("s0_mode"), index.at_text("D10012")
+"""
+
+from array import array
+import argparse
+import bisect
+import itertools
+import mmap
+import struct
+import sys
+import zlib
+import address_codec as codec
+
+
+# magic, version, rows, hash slots, bytes of names, bytes of type names
+MAGIC = b"GVTX"
+VERSION = 2
+HEADER = struct.Struct("<4sHxxIIII")
+
+# sections in file order, every one starts aligned to its item size:
+# addrs (q, per row), sorted_addrs (q), sorted_ends (q, end of each range in address order),
+# max_ends (q, furthest end up to each position in address order), name_ends (I, per row),
+# addr_order (I, rows by address), slots (I, row + 1 or 0 for empty), type_codes (H, per row),
+# is_bits (B, per row), names, type names
+SECTIONS = (
+    ('addrs', 'q'), ('sorted_addrs', 'q'), ('sorted_ends', 'q'), ('max_ends', 'q'), ('name_ends', 'I'),
+    ('addr_order', 'I'), ('slots', 'I'), ('type_codes', 'H'), ('is_bits', 'B'),
+)
+
+
+def main(argv=None):
+
+    # parameter
+    parser = argparse.ArgumentParser(description="Look up names and addresses in a tag index")
+    parser.add_argument("index_name", help="index file written with --index, e.g. global_variable_table.idx")
+    parser.add_argument("--name", nargs="+", default=[], help="print the address of each name")
+    parser.add_argument("--addr", nargs="+", default=[], metavar="ADDR",
+                        help="print the names at each address, a word address also finds its bits")
+    args = parser.parse_args(argv)
+
+    with TagIndex(args.index_name) as index:
+        for name, row in zip(args.name, index.find_many(args.name)):
+            print("{}: {}".format(name, "-" if row is None else index.describe(row)))
+        for text in args.addr:
+            print("{}: {}".format(text, ", ".join(index.describe(row) for row in index.at_text(text)) or "-"))
+
+
+def write_index(file, table) -> int:
+    # table is a RecordTable, returns the number of bytes written
+    n_rows = len(table)
+    names = [name.encode() for name in table.names]
+    name_ends = array('I', bytes(4 * n_rows))
+    end = 0
+    for i, name in enumerate(names):
+        end += len(name)
+        name_ends[i] = end
+    name_blob = b"".join(names)
+    type_blob = "\n".join(table.type_names).encode()
+
+    addr_order = array('I', sorted(range(n_rows), key=table.addrs.__getitem__))
+    type_bits = [row_bits(var_type) for var_type in table.type_names]
+    sorted_ends = array('q', (table.addrs[i] + type_bits[table.type_codes[i]] for i in addr_order))
+    max_ends = array('q', itertools.accumulate(sorted_ends, max))
+    columns = {
+        'addrs': array('q', table.addrs),
+        'sorted_addrs': array('q', (table.addrs[i] for i in addr_order)),
+        'sorted_ends': sorted_ends,
+        'max_ends': max_ends,
+        'name_ends': name_ends,
+        'addr_order': addr_order,
+        'slots': hash_slots(names),
+        'type_codes': array('H', table.type_codes),
+        'is_bits': array('B', table.is_bits),
+    }
+    if sys.byteorder != "little":
+        for values in columns.values():
+            values.byteswap()
+
+    # sections are written one by one, the index is never held in memory as a whole
+    size = file.write(HEADER.pack(MAGIC, VERSION, n_rows, len(columns['slots']), len(name_blob), len(type_blob)))
+    for key, code in SECTIONS:
+        size += file.write(bytes(-size % array(code).itemsize))
+        columns[key].tofile(file)
+        size += len(columns[key]) * columns[key].itemsize
+    size += file.write(name_blob)
+    size += file.write(type_blob)
+    return size
+
+
+def row_bits(var_type: str) -> int:
+    # bits a row occupies, hmi_tag rows are typed BIT or WORD
+    if var_type == "BIT":
+        return 1
+    descriptor = codec.compile_type(var_type)
+    if descriptor.stride is None:
+        raise RuntimeError("Invalid type {}".format(var_type))
+    return descriptor.count * descriptor.stride
+
+
+def hash_slots(names: list) -> array:
+    # at most half the slots are taken, so probes stay short
+    n_slots = 1
+    while n_slots < 2 * len(names):
+        n_slots <<= 1
+    slots = array('I', bytes(4 * n_slots))
+    mask = n_slots - 1
+    for row, name in enumerate(names):
+        slot = name_hash(name) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = row + 1
+    return slots
+
+
+def name_hash(name: bytes) -> int:
+    # the same in every process, unlike hash()
+    return zlib.crc32(name)
+
+
+class TagIndex:
+    # an index file mapped into memory, lookups read the sections in place,
+    # sections are read in native order so only on little-endian machines, where they are written
+    __slots__ = ('n_rows', 'type_names', '_file', '_map', '_views', '_names', '_mask') + \
+                tuple(key for key, _ in SECTIONS)
+
+    def __init__(self, filename: str):
+        if sys.byteorder != "little":
+            raise RuntimeError("Tag indexes can only be read on little-endian machines")
+        self._file = open(filename, mode='rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            self._file.close()
+            raise
+        self._views = []
+
+        header = HEADER.unpack_from(self._map) if len(self._map) >= HEADER.size else None
+        if header is None or header[:2] != (MAGIC, VERSION):
+            self.close()
+            raise RuntimeError("{} is not a tag index of version {}".format(filename, VERSION))
+        _, _, n_rows, n_slots, names_size, types_size = header
+
+        lengths = {'name_ends': n_rows, 'slots': n_slots}
+        sections = []
+        offset = HEADER.size
+        for key, code in SECTIONS:
+            itemsize = array(code).itemsize
+            offset += -offset % itemsize
+            size = lengths.get(key, n_rows) * itemsize
+            sections.append((key, code, offset, size))
+            offset += size
+        if offset + names_size + types_size != len(self._map):
+            self.close()
+            raise RuntimeError("{} is truncated".format(filename))
+
+        # sections are views into the map, nothing is copied
+        view = memoryview(self._map)
+        self._views.append(view)
+        for key, code, start, size in sections:
+            section = view[start:start + size].cast(code)
+            self._views.append(section)
+            setattr(self, key, section)
+        self._names = view[offset:offset + names_size]
+        self._views.append(self._names)
+        offset += names_size
+
+        self.n_rows = n_rows
+        self.type_names = bytes(view[offset:]).decode().split("\n") if types_size else []
+        self._mask = n_slots - 1
+
+    def __len__(self) -> int:
+        return self.n_rows
+
+    def __enter__(self) -> "TagIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        # views into the map have to be released before it can be closed
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._map.close()
+        self._file.close()
+
+    def name(self, row: int) -> str:
+        return bytes(self._name_bytes(row)).decode()
+
+    def _name_bytes(self, row: int) -> memoryview:
+        start = self.name_ends[row - 1] if row else 0
+        return self._names[start:self.name_ends[row]]
+
+    def row(self, row: int) -> tuple:
+        # (name, addr, is_bit, type) of a row
+        return self.name(row), self.addrs[row], bool(self.is_bits[row]), self.type_names[self.type_codes[row]]
+
+    def describe(self, row: int) -> str:
+        # "name (D10012, WORD)"
+        return "{} ({}, {})".format(self.name(row), codec.format_addr(self.addrs[row], self.is_bits[row]),
+                                    self.type_names[self.type_codes[row]])
+
+    def find(self, name: str) -> int:
+        # row of a name, None when it is not in the table
+        key = name.encode()
+        slot = name_hash(key) & self._mask
+        while True:
+            row = self.slots[slot] - 1
+            if row < 0:
+                return None
+            if self._name_bytes(row) == key:
+                return row
+            slot = (slot + 1) & self._mask
+
+    def find_many(self, names) -> list:
+        return [self.find(name) for name in names]
+
+    def address_of(self, name: str) -> str:
+        # "D10012" or "D10002.0", None when the name is not in the table
+        row = self.find(name)
+        if row is None:
+            return None
+        return codec.format_addr(self.addrs[row], self.is_bits[row])
+
+    def between(self, start: int, end: int) -> list:
+        # rows whose encoded address range overlaps [start, end), in address order,
+        # the walk back stops once no earlier range reaches start
+        i = bisect.bisect_left(self.sorted_addrs, end)
+        found = []
+        while i > 0 and self.max_ends[i - 1] > start:
+            i -= 1
+            if self.sorted_ends[i] > start:
+                found.append(self.addr_order[i])
+        return found[::-1]
+
+    def at(self, addr: int, is_bit: bool = True) -> list:
+        # rows holding an encoded address, for a word address (is_bit False) any of its bits,
+        # a word or bit inside an array finds the array
+        if is_bit:
+            return self.between(addr, addr + 1)
+        return self.between(addr, addr + (1 << codec.BIT_INDEX_BITS))
+
+    def at_text(self, text: str) -> list:
+        # "D10012" or "D10002.0"
+        return self.at(*codec.parse_addr(text))
+
+    def at_many(self, addrs) -> list:
+        # addrs are (encoded addr, is_bit)
+        return [self.at(addr, is_bit) for addr, is_bit in addrs]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+    Template Cache:
+
+    Function:
+    - stores the parsed tables of a template on disk, keyed by the content
+      hash of the workbook, the reader that parsed it and the schema version
+      of the parsed data
+    - unchanged workbooks are served from the cache without parsing excel
+    - least recently used entries are evicted once the cache exceeds its size cap
+"""
+
+import os
+import hashlib
+import pickle
+import zlib
+
+
+SCHEMA_VERSION = 4
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+CACHE_SUFFIX = ".cache"
+
+
+def cache_key(data: bytes, reader: str = "xml") -> str:
+    # each reader has its own entries, a run asking for a reader always gets tables it parsed
+    digest = hashlib.sha256(data).hexdigest()
+    return "{}-{}-v{}".format(digest, reader, SCHEMA_VERSION)
+
+
+def load_cached(cache_dir: str, key: str) -> dict:
+    path = os.path.join(cache_dir, key + CACHE_SUFFIX)
+    try:
+        with open(path, mode='rb') as file:
+            parsed = pickle.loads(zlib.decompress(file.read()))
+    except FileNotFoundError:
+        return None
+    except (OSError, zlib.error, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        # corrupted entry or one whose classes no longer resolve, drop it and parse the workbook again
+        remove_entry(path)
+        return None
+
+    # mark entry as recently used for lru eviction, another process may have evicted it meanwhile
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return parsed
+
+
+def store_cached(cache_dir: str, key: str, parsed: dict, max_size: int = DEFAULT_MAX_SIZE) -> None:
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, key + CACHE_SUFFIX)
+    tmp_path = "{}.{}.tmp".format(path, os.getpid())
+
+    with open(tmp_path, mode='wb') as file:
+        file.write(zlib.compress(pickle.dumps(parsed, protocol=pickle.HIGHEST_PROTOCOL)))
+    os.replace(tmp_path, path)
+
+    evict(cache_dir, max_size)
+
+
+def evict(cache_dir: str, max_size: int) -> None:
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(CACHE_SUFFIX):
+            continue
+        path = os.path.join(cache_dir, name)
+        # processes sharing the cache evict concurrently, an entry can vanish after listdir
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    # remove least recently used entries until the cache fits its size cap
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= max_size:
+            break
+        remove_entry(path)
+        total_size -= size
+
+
+def clear_cache(cache_dir: str) -> None:
+    if not os.path.isdir(cache_dir):
+        return
+    for name in os.listdir(cache_dir):
+        if name.endswith(CACHE_SUFFIX):
+            remove_entry(os.path.join(cache_dir, name))
+
+
+def remove_entry(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,73 @@
+"""
+    Template Watcher:
+
+    Function:
+    - polls a template file and calls back once a save has settled, i.e. its
+      size, modification time and inode have not changed for the debounce time
+    - excel saves by writing a temporary file and renaming it over the
+      template, the template missing or unreadable for a moment is waited out,
+      lock files (~$name.xlsx) beside it are never looked at
+    - a failing callback is reported and the template is watched for the next save
+"""
+
+import os
+import time
+import traceback
+
+
+DEFAULT_INTERVAL = 0.1
+DEFAULT_DEBOUNCE = 0.2
+
+
+def watch(filename: str, callback, interval: float = DEFAULT_INTERVAL, debounce: float = DEFAULT_DEBOUNCE) -> None:
+    # runs until interrupted, callback is called once at the start and after every save
+    print("watching {} (ctrl+c to stop)".format(filename))
+    last_seen = file_state(filename)
+    run_callback(callback)
+
+    try:
+        while True:
+            time.sleep(interval)
+            state = file_state(filename)
+            if state == last_seen or state is None:
+                continue
+
+            # wait for the save to settle before reading the workbook
+            state = wait_until_stable(filename, state, interval, debounce)
+            if state is None:
+                continue
+            last_seen = state
+            run_callback(callback)
+
+    except KeyboardInterrupt:
+        print("stopped watching {}".format(filename))
+
+
+def wait_until_stable(filename: str, state: tuple, interval: float, debounce: float) -> tuple:
+    stable_since = time.monotonic()
+    while time.monotonic() - stable_since < debounce:
+        time.sleep(interval)
+        new_state = file_state(filename)
+        if new_state != state:
+            state = new_state
+            stable_since = time.monotonic()
+    return state
+
+
+def file_state(filename: str) -> tuple:
+    try:
+        stat = os.stat(filename)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+def run_callback(callback) -> None:
+    start = time.perf_counter()
+    try:
+        callback()
+    except Exception:
+        traceback.print_exc()
+        print("generation failed, waiting for the next save")
+        return
+    print("done in {:.0f} ms".format((time.perf_counter() - start) * 1000))
@@ -0,0 +1,51 @@
+import csv
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import address_codec as codec
+import global_variable_generator as gvg
+
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "global_variable_template.xlsx")
+PLC_NAMES = ("{EtherLink1}1@", "{EtherLink2}1@", "{EtherLink3}1@")
+
+
+def read_addrs(filename: str) -> list:
+    with open(filename, newline='') as file:
+        return [row[2] for row in csv.reader(file)][1:]
+
+
+def test_every_link_has_its_own_prefix(tmp_path):
+    tables = gvg.generate(TEMPLATE)
+    links = [(plc_name, str(tmp_path / "hmi_tag_{}.csv".format(i))) for i, plc_name in enumerate(PLC_NAMES)]
+    gvg.write_outputs(tables.global_var_table, tables.hmi_tag_table, str(tmp_path / "global_variable_table.csv"),
+                      links)
+
+    for plc_name, filename in links:
+        addrs = read_addrs(filename)
+        assert any(addr.startswith(plc_name) for addr in addrs)
+        assert not any(addr.startswith(other) for addr in addrs for other in PLC_NAMES if other != plc_name)
+
+
+def test_links_match_single_plc_name_runs(tmp_path):
+    # every link file is the hmi_tag.csv a run with --plc-name of that prefix writes
+    tables = gvg.generate(TEMPLATE)
+    links = [(plc_name, str(tmp_path / "link_{}.csv".format(i))) for i, plc_name in enumerate(PLC_NAMES)]
+    gvg.write_outputs(tables.global_var_table, tables.hmi_tag_table, str(tmp_path / "global_variable_table.csv"),
+                      links)
+
+    hmi_addrs = [codec.format_addr(addr, is_bit) for addr, is_bit
+                 in zip(tables.hmi_tag_table.addrs, tables.hmi_tag_table.is_bits)
+                 if addr >> codec.AREA_SHIFT == codec.HMI_AREA]
+    assert hmi_addrs
+    for i, (plc_name, filename) in enumerate(links):
+        single = str(tmp_path / "single_{}.csv".format(i))
+        gvg.write_outputs(tables.global_var_table, tables.hmi_tag_table, str(tmp_path / "global_variable_table.csv"),
+                          [(plc_name, single)])
+        with open(filename, 'rb') as linked_file, open(single, 'rb') as single_file:
+            assert linked_file.read() == single_file.read()
+
+        # hmi internal ($) registers are local to the hmi and carry no prefix
+        addrs = read_addrs(filename)
+        assert all(addr in addrs for addr in hmi_addrs)
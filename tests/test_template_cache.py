@@ -0,0 +1,47 @@
+import concurrent.futures
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import template_cache
+
+
+ROUNDS = 200
+PROCESSES = 8
+
+
+def store_and_load(cache_dir: str, worker: int) -> int:
+    # every store evicts, with a cap of a few entries the processes keep deleting each other's entries
+    parsed = {'rows': list(range(256))}
+    hits = 0
+    for i in range(ROUNDS):
+        key = template_cache.cache_key("{}-{}".format(worker, i % 16).encode())
+        if template_cache.load_cached(cache_dir, key) is not None:
+            hits += 1
+        template_cache.store_cached(cache_dir, key, parsed, max_size=4096)
+    return hits
+
+
+def test_processes_share_cache_dir(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    os.makedirs(cache_dir)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=PROCESSES) as executor:
+        futures = [executor.submit(store_and_load, cache_dir, worker) for worker in range(PROCESSES)]
+        # raises the first FileNotFoundError of any worker
+        for future in futures:
+            future.result()
+
+    entries = [name for name in os.listdir(cache_dir) if name.endswith(template_cache.CACHE_SUFFIX)]
+    assert sum(os.path.getsize(os.path.join(cache_dir, name)) for name in entries) <= 4096 * 2
+
+
+def test_evict_skips_vanished_entries(tmp_path, monkeypatch):
+    cache_dir = str(tmp_path)
+    for i in range(3):
+        template_cache.store_cached(cache_dir, "k{}".format(i), {'i': i})
+
+    # an entry removed by another process between listdir and stat
+    listdir = os.listdir
+    monkeypatch.setattr(os, "listdir", lambda path: listdir(path) + ["gone" + template_cache.CACHE_SUFFIX])
+    template_cache.evict(cache_dir, max_size=0)
+    assert not [name for name in listdir(cache_dir) if name.endswith(template_cache.CACHE_SUFFIX)]
@@ -0,0 +1,178 @@
+"""
+    Lightweight XLSX Reader:
+
+    Function:
+    - reads sheets of an xlsx workbook straight from its zip container
+      with streaming xml parsing, using only the standard library
+    - returns each sheet as {column header: list of values}, the same
+      layout the openpyxl reader of the generator produces
+    - cached results are read for formula cells, numbers are int when they
+      have no fractional part, dates are returned as their serial number
+"""
+
+import posixpath
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+
+REL_ID = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}id"
+REL_ID_STRICT = "{http://purl.oclc.org/ooxml/officeDocument/relationships}id"
+
+
+def read_sheets(filename, sheet_names) -> dict:
+    # filename may also be a file object
+    with zipfile.ZipFile(filename) as archive:
+        sheet_paths = read_sheet_paths(archive)
+        shared_strings = read_shared_strings(archive)
+
+        tables = {}
+        for name in sheet_names:
+            if name not in sheet_paths:
+                raise KeyError("Worksheet {} does not exist.".format(name))
+            tables[name] = rows_to_columns(iter_sheet_rows(archive, sheet_paths[name], shared_strings))
+
+    return tables
+
+
+def rows_to_columns(rows) -> dict:
+    # first row is the header, trailing empty header cells and trailing empty rows are dropped
+    header = list(next(rows, ()))
+    while header and header[-1] is None:
+        header.pop()
+
+    columns = [[] for _ in header]
+    n_rows = 0
+    for row in rows:
+        for column, value in zip(columns, row):
+            # match pandas, whole-number floats are read as int
+            if isinstance(value, float) and value.is_integer():
+                value = int(value)
+            column.append(value)
+        for column in columns[len(row):]:
+            column.append(None)
+
+        # keep track of the last non-empty row
+        if any(x is not None for x in row[:len(columns)]):
+            n_rows = len(columns[0]) if columns else 0
+
+    return {name: column[:n_rows] for name, column in zip(header, columns)}
+
+
+def read_sheet_paths(archive: zipfile.ZipFile) -> dict:
+    # sheet name -> path of its xml part inside the archive
+    targets = {}
+    with archive.open("xl/_rels/workbook.xml.rels") as file:
+        for _, elem in iterparse(file):
+            if local_name(elem.tag) == "Relationship":
+                target = elem.get("Target")
+                if target.startswith("/"):
+                    target = target[1:]
+                else:
+                    target = posixpath.normpath(posixpath.join("xl", target))
+                targets[elem.get("Id")] = target
+
+    sheet_paths = {}
+    with archive.open("xl/workbook.xml") as file:
+        for _, elem in iterparse(file):
+            if local_name(elem.tag) == "sheet":
+                rel_id = elem.get(REL_ID) or elem.get(REL_ID_STRICT)
+                sheet_paths[elem.get("name")] = targets[rel_id]
+
+    return sheet_paths
+
+
+def read_shared_strings(archive: zipfile.ZipFile) -> list:
+    strings = []
+    if "xl/sharedStrings.xml" not in archive.namelist():
+        return strings
+
+    with archive.open("xl/sharedStrings.xml") as file:
+        texts = []
+        for event, elem in iterparse(file, events=("start", "end")):
+            tag = local_name(elem.tag)
+            if event == "start":
+                if tag == "si":
+                    texts = []
+                continue
+
+            # phonetic runs (rPh) are not part of the cell text
+            if tag == "t":
+                texts.append(elem.text or "")
+            elif tag == "rPh":
+                for child in elem:
+                    if local_name(child.tag) == "t":
+                        texts.pop()
+            elif tag == "si":
+                strings.append("".join(texts))
+                elem.clear()
+
+    return strings
+
+
+def iter_sheet_rows(archive: zipfile.ZipFile, path: str, shared_strings: list):
+    # yields one tuple of cell values per row, rows missing from the xml are yielded empty
+    next_row = 1
+    with archive.open(path) as file:
+        for _, elem in iterparse(file):
+            if local_name(elem.tag) != "row":
+                continue
+
+            row_idx = int(elem.get("r", next_row))
+            while next_row < row_idx:
+                yield ()
+                next_row += 1
+
+            values = []
+            for cell in elem:
+                if local_name(cell.tag) != "c":
+                    continue
+                ref = cell.get("r")
+                col_idx = column_index(ref) if ref else len(values)
+                values.extend([None] * (col_idx - len(values)))
+                values.append(cell_value(cell, shared_strings))
+
+            while values and values[-1] is None:
+                values.pop()
+
+            yield tuple(values)
+            next_row = row_idx + 1
+            elem.clear()
+
+
+def cell_value(cell, shared_strings: list):
+    cell_type = cell.get("t", "n")
+    value = None
+    for child in cell:
+        tag = local_name(child.tag)
+        if tag == "v":
+            value = child.text
+        elif tag == "is":
+            value = "".join(x.text or "" for x in child.iter() if local_name(x.tag) == "t")
+
+    if value is None:
+        return None
+    if cell_type == "s":
+        return shared_strings[int(value)]
+    if cell_type == "b":
+        return value == "1"
+    if cell_type == "n":
+        if "." in value or "E" in value or "e" in value:
+            return float(value)
+        return int(value)
+
+    # str (formula result), inlineStr, e (error) and d (iso date) are kept as text
+    return value
+
+
+def column_index(ref: str) -> int:
+    # "C12" -> 2
+    index = 0
+    for char in ref:
+        if not char.isalpha():
+            break
+        index = index * 26 + ord(char.upper()) - ord("A") + 1
+    return index - 1
+
+
+def local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]